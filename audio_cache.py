@@ -0,0 +1,143 @@
+""" Module which includes the cache used to reuse the audio.mp3 already generated by a previous export. """
+
+import hashlib
+import json
+import os
+import shutil
+
+class Audio_cache:
+	"""
+		Object:
+			Represents a folder where the generated audio.mp3 files are kept, to reuse them when the same audio is exported again.
+			Each file is named by a hash of everything used to create it (see getKey()), so a file is never reused for another audio.
+			When the folder becomes bigger than max_size, the least recently used files are deleted.
+		Arguments:
+			folder_path (str): where to keep the cached files. Created if needed.
+			(optional) max_size (int): maximum size of the cache, in bytes. 512 MB by default.
+			(optional) enabled (bool): if False, nothing is read from or added to the cache. True by default.
+	"""
+
+	def __init__(self, folder_path, max_size=512*1024*1024, enabled=True):
+		self.folder_path = folder_path
+		self.max_size = max_size
+		self.enabled = enabled
+
+	def addFile(self, key, file_path):
+		"""
+			Class method:
+				Copy a generated file into the cache, then delete the oldest files if the cache is too big.
+				Do nothing if the cache is disabled.
+			Arguments:
+				key (str): the key of the file, from getKey().
+				file_path (str): the file to copy.
+			Return:
+				Nothing.
+		"""
+		if not(self.enabled):
+			return
+
+		os.makedirs(self.folder_path, exist_ok=True)
+		temp_path = f"{self.getPath(key)}.{os.getpid()}.tmp"  # the file is copied under another name first, so an unfinished copy is never used
+		shutil.copyfile(file_path, temp_path)
+		os.replace(temp_path, self.getPath(key))
+
+		self.removeOldFiles()
+
+	def getFile(self, key):
+		"""
+			Class method:
+				Look for a file in the cache. If it's found, it becomes the most recently used file.
+			Arguments:
+				key (str): the key of the file, from getKey().
+			Return:
+				(str): the path to the cached file, or None if it isn't in the cache (or if the cache is disabled).
+		"""
+		if not(self.enabled):
+			return None
+
+		cached_file_path = self.getPath(key)
+		try:
+			os.utime(cached_file_path)  # mark as recently used
+		except OSError:  # not in the cache
+			return None
+		return cached_file_path
+
+	def getKey(self, audio_paths, volumes, bitrate, mixing_mode, audio_hashes=None):
+		"""
+			Class method:
+				Returns the key of the audio generated from these settings.
+				The audio files are identified by their content, not by their path.
+			Arguments:
+				audio_paths (list of str): the audio files used.
+				volumes (list of float): the volume applied to each audio file, in dB (from percentTodB()).
+				bitrate (str): the bitrate of the mp3 (ex: "192k").
+				mixing_mode (str): how the audio files are merged.
+				(optional) audio_hashes (list of str): the hash of each audio file (from getFileHash()), if it's already known. None (default) = the audio files are read.
+			Return:
+				(str): the key (a hash).
+		"""
+		if audio_hashes == None:
+			audio_hashes = [getFileHash(audio_path) for audio_path in audio_paths]
+		key_data = {
+			"audio": audio_hashes,
+			"volumes": volumes,
+			"bitrate": bitrate,
+			"mixing_mode": mixing_mode
+		}
+		return hashlib.sha256(json.dumps(key_data, sort_keys=True).encode("utf-8")).hexdigest()
+
+	def getPath(self, key):
+		"""
+			Class method:
+				Returns where the file of the key is (or would be) in the cache.
+			Arguments:
+				key (str): the key of the file, from getKey().
+			Return:
+				(str): the path to the file.
+		"""
+		return f"{self.folder_path}/{key}.mp3"
+
+	def removeOldFiles(self):
+		"""
+			Class method:
+				Delete the least recently used files until the cache is smaller than self.max_size.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		cached_files = []  # list of [last use time, size, path]
+		for file_name in os.listdir(self.folder_path):
+			if file_name.endswith(".mp3"):
+				try:
+					file_stat = os.stat(f"{self.folder_path}/{file_name}")
+				except OSError:  # deleted in the meantime by another export
+					continue
+				cached_files.append([file_stat.st_mtime, file_stat.st_size, f"{self.folder_path}/{file_name}"])
+
+		cache_size = sum(cached_file[1] for cached_file in cached_files)
+		cached_files.sort()  # oldest first
+		for last_use_time, file_size, file_path in cached_files:
+			if cache_size <= self.max_size:
+				break
+			try:
+				os.remove(file_path)
+			except OSError:
+				print(f"WARNING: error while trying to delete the cached audio ('{file_path}')")
+			else:
+				cache_size -= file_size
+
+def getFileHash(file_path):
+	"""
+		Method:
+			Returns the hash of the content of a file. The file is read by chunks.
+		Arguments:
+			file_path (str): the file to read.
+		Return:
+			(str): the SHA-256 of the file.
+	"""
+	file_hash = hashlib.sha256()
+	with open(file_path, "rb") as file:
+		for chunk in iter(lambda: file.read(1024*1024), b""):
+			file_hash.update(chunk)
+	return file_hash.hexdigest()
@@ -0,0 +1,349 @@
+""" Module which includes the converter of several songs at once (for example a whole mod pack). """
+
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from fnf_converter import Osz_converter, fileExists
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+
+class Batch_converter:
+	"""
+		Object:
+			Converts several Osu_map to .osz at the same time.
+			Each song is split in tasks: 1 for the audio.mp3 and 1 per difficulty. All tasks of all songs run in the same processes,
+			so a process which finishes a task takes the next one, whatever the song. The audios are the longest tasks, so they're started first
+			(the biggest audio files first), then the difficulties (the biggest charts first): this way no process waits alone at the end.
+			When all tasks of a song are done, its .osz is written (see Osz_converter.writeOsz()). If a task fails, only its song fails: the other songs are still converted.
+			The prints of the processes (warnings...) go to stderr, so stdout only has what the main process writes (see redirectStdout()).
+		Arguments:
+			(optional) workers (int): amount of processes to use. 0 (default) = 1 per CPU core.
+			(optional) audio_cache (Audio_cache object): the cache where to look for the audio.mp3 before creating it. None (default) = no cache.
+			(optional) progress_callback (function): called after each task with (current step (int), total steps (int), status (str)). None (default) = print the status.
+			(optional) song_callback (function): called when a song is finished (converted or failed) with its result (dict, see convertSongs()). None by default.
+			(optional) audio_backend (str): how the audio.mp3 are created, see Osz_converter.exportAudio(). "ffmpeg" (default) or "pydub".
+	"""
+
+	def __init__(self, workers=0, audio_cache=None, progress_callback=None, song_callback=None, audio_backend="ffmpeg"):
+		self.workers = workers
+		self.audio_cache = audio_cache
+		self.audio_backend = audio_backend
+		self.progress_callback = progress_callback
+		self.song_callback = song_callback
+
+		self.__current_step = 0  # current step of convertSongs()
+		self.__total_steps = 0  # total amount of steps of convertSongs()
+
+	def convertSongs(self, osu_maps, path, report_path=None):
+		"""
+			Class method:
+				Convert all the Osu_map to .osz files.
+			Arguments:
+				osu_maps (list of Osu_map objects): the songs to convert.
+				path (str): where to create the .osz files.
+				(optional) report_path (str): where to write the report (JSON file). None (default) = no file.
+			Return:
+				(dict): the report: {"songs": list of results, "succeeded": int, "failed": int, "workers": int, "time": float (s)}.
+				The result of each song is a dict: {"title": str, "osz": path of the .osz or None, "error": traceback (str) or None,
+				"audio": "cache" or "generated", "timings": {"audio", "charts", "assembly", "finished_after"} (float, in s)}.
+		"""
+		start_time = time.perf_counter()
+		songs = [self.prepareSong(osu_map) for osu_map in osu_maps]
+		workers_count = self.getWorkersCount()
+
+		# tasks: the audios first, then the difficulties, the biggest files first
+		audio_tasks = [song for song in songs if song["result"]["error"] == None and song["temp_audio_path"] != ""]
+		audio_tasks.sort(key=lambda song: song["audio_size"], reverse=True)
+		chart_tasks = [(song, diff_name) for song in songs if song["result"]["error"] == None for diff_name in song["osu_map"].fnf_charts.keys()]
+		chart_tasks.sort(key=lambda task: getFileSize(task[0]["osu_map"].fnf_charts[task[1]].map_path), reverse=True)
+
+		self.__current_step = 0
+		self.__total_steps = len(audio_tasks) + len(chart_tasks) + len(songs)  # + writing each .osz
+
+		with ProcessPoolExecutor(max_workers=workers_count, initializer=redirectStdout) as executor:
+			future_tasks = {}  # {future: (song, difficulty name or None for the audio)}
+			for song in audio_tasks:
+				future = executor.submit(runTimedTask, exportAudio, song["osu_map"], song["temp_audio_path"], self.audio_backend)
+				future_tasks[future] = (song, None)
+			for song, diff_name in chart_tasks:
+				osu_map = song["osu_map"]
+				future = executor.submit(runTimedTask, osu_map.fnf_charts[diff_name].getOsuFileContent, diff_name, osu_map.creator, osu_map.tags)
+				future_tasks[future] = (song, diff_name)
+			for future, (song, diff_name) in future_tasks.items():
+				song["futures"].add(future)
+
+			# songs without tasks (failed during the preparation, or without difficulty to create)
+			for song in songs:
+				if len(song["futures"]) == 0:
+					self.finishSong(song, path, start_time)
+
+			pending_futures = set(future_tasks.keys())
+			while len(pending_futures) > 0:
+				done_futures, pending_futures = wait(pending_futures, return_when=FIRST_COMPLETED)
+				for future in done_futures:
+					song, diff_name = future_tasks[future]
+					song["futures"].discard(future)
+					self.saveTaskResult(song, diff_name, future)
+					if len(song["futures"]) == 0:  # all tasks of the song are done
+						self.finishSong(song, path, start_time)
+
+		# the generated audios are added to the cache only now: a cached audio used by a song can't be removed from the cache before its .osz is written
+		self.cacheAudios(songs)
+
+		# report
+		results = [song["result"] for song in songs]
+		failed_count = len([result for result in results if result["error"] != None])
+		report = {"songs": results, "succeeded": len(results) - failed_count, "failed": failed_count, "workers": workers_count, "time": time.perf_counter() - start_time}
+		if report_path != None:
+			with open(report_path, "w", encoding="utf-8") as report_file:
+				json.dump(report, report_file, indent=4)
+		return report
+
+	def cacheAudios(self, songs):
+		"""
+			Class method:
+				Add the audio generated for each converted song to the audio cache, then delete the temporary audio files left by finishSong().
+				If an audio can't be added, the song still succeeded: it's only a warning.
+			Arguments:
+				songs (list of dict): the songs, from prepareSong().
+			Return:
+				Nothing.
+		"""
+		for song in songs:
+			if song["temp_audio_path"] == "" or not(fileExists(song["temp_audio_path"])):  # from the cache, or already deleted
+				continue
+			if song["result"]["osz"] != None and song["audio_cache_key"] != None:
+				try:
+					self.audio_cache.addFile(song["audio_cache_key"], song["temp_audio_path"])
+				except OSError:
+					print(f"WARNING: error while trying to add the audio of '{song['osu_map'].title}' to the cache")
+			removeTempAudio(song)
+
+	def finishSong(self, song, path, start_time):
+		"""
+			Class method:
+				Write the .osz of a song when all its tasks are done (if none of them failed), then clean its temporary files.
+				The generated audio is kept if it has to be added to the cache (see cacheAudios()).
+			Arguments:
+				song (dict): the song, from prepareSong().
+				path (str): where to create the .osz.
+				start_time (float): when convertSongs() started (time.perf_counter()).
+			Return:
+				Nothing.
+		"""
+		osu_map = song["osu_map"]
+		result = song["result"]
+		try:
+			if result["error"] == None:
+				self.status(f"Writing the .osz of '{osu_map.title}'...")
+				assembly_start_time = time.perf_counter()
+				osz_converter = song["osz_converter"]
+				osu_files = {osu_map.fnf_charts[diff_name].getOsuFileName(diff_name, osu_map.creator): song["osu_files"][diff_name] for diff_name in osu_map.fnf_charts.keys()}
+				osz_converter.writeOsz(osu_map, osz_converter.getOszPath(path), song["audio_path"], osu_files=osu_files)
+				result["osz"] = osz_converter.osz_path
+				result["timings"]["assembly"] = time.perf_counter() - assembly_start_time
+			else:
+				self.status(f"Failed to convert '{osu_map.title}'.")
+		except Exception:
+			result["error"] = traceback.format_exc()
+			if result["osz"] == None and song["osz_converter"] != None:  # remove the .osz if the error happened after it was written
+				song["osz_converter"].deleteGeneratedFiles()
+		finally:
+			if song["temp_audio_path"] != "" and (result["osz"] == None or song["audio_cache_key"] == None):  # else it's deleted by cacheAudios()
+				removeTempAudio(song)
+			song["osu_files"] = {}  # free the memory
+			result["timings"]["finished_after"] = time.perf_counter() - start_time
+
+		if self.song_callback != None:
+			self.song_callback(result)
+
+	def getWorkersCount(self):
+		"""
+			Class method:
+				Returns the amount of processes to use, according to self.workers.
+			Arguments:
+				None.
+			Return:
+				(int): the amount of processes (at least 1).
+		"""
+		if self.workers > 0:
+			return self.workers
+		return os.cpu_count() or 1
+
+	def prepareSong(self, osu_map):
+		"""
+			Class method:
+				Prepare the conversion of a song: look for its audio in the cache, and create its temporary audio file if it isn't there.
+				If it fails, the song is marked as failed (the error is saved in its result).
+			Arguments:
+				osu_map (Osu_map object): the song to convert.
+			Return:
+				(dict): the song: {"osu_map", "osz_converter", "result", "futures" (set of the running tasks), "osu_files" ({diff_name: content}),
+				"audio_path" (the mp3 to put in the .osz), "temp_audio_path" (the mp3 to generate, "" if from the cache), "audio_cache_key", "audio_size" (size of the audio files)}.
+		"""
+		song = {
+			"osu_map": osu_map,
+			"osz_converter": None,
+			"result": {"title": osu_map.title, "osz": None, "error": None, "audio": None, "timings": {"audio": 0, "charts": 0, "assembly": 0, "finished_after": 0}},
+			"futures": set(),
+			"osu_files": {},
+			"audio_path": "",
+			"temp_audio_path": "",
+			"audio_cache_key": None,
+			"audio_size": 0
+		}
+		try:
+			osz_converter = Osz_converter(audio_cache=self.audio_cache, progress_callback=ignoreStatus, audio_backend=self.audio_backend)  # used for the names and the cache
+			osz_converter.folder_name = osz_converter.getFolderName(osu_map)
+			song["osz_converter"] = osz_converter
+
+			song["audio_cache_key"] = osz_converter.getAudioCacheKey(osu_map)
+			if song["audio_cache_key"] != None:
+				cached_audio_path = self.audio_cache.getFile(song["audio_cache_key"])
+			else:
+				cached_audio_path = None
+
+			if cached_audio_path != None:
+				song["audio_path"] = cached_audio_path
+				song["result"]["audio"] = "cache"
+			else:
+				temp_audio_file, song["temp_audio_path"] = tempfile.mkstemp(suffix=".mp3")
+				os.close(temp_audio_file)
+				song["audio_path"] = song["temp_audio_path"]
+				song["audio_size"] = getFileSize(osu_map.audio1_path) + (getFileSize(osu_map.audio2_path) if osu_map.audio2_path != "" else 0)
+				song["result"]["audio"] = "generated"
+		except Exception:
+			song["result"]["error"] = traceback.format_exc()
+		return song
+
+	def saveTaskResult(self, song, diff_name, future):
+		"""
+			Class method:
+				Save the result of a finished task in its song. If the task failed, the song fails and its other tasks are cancelled.
+			Arguments:
+				song (dict): the song of the task, from prepareSong().
+				diff_name (str): the difficulty created by the task, None for the audio.
+				future (Future): the finished task.
+			Return:
+				Nothing.
+		"""
+		if diff_name == None:
+			self.status(f"Created the audio of '{song['osu_map'].title}'.")
+		else:
+			self.status(f"Created the difficulty '{diff_name}' of '{song['osu_map'].title}'.")
+
+		if future.cancelled():  # the song already failed
+			return
+		try:
+			task_result, task_time = future.result()
+		except Exception as error:
+			if song["result"]["error"] == None:  # only the first error
+				song["result"]["error"] = "".join(traceback.format_exception(type(error), error, error.__traceback__))
+				for other_future in song["futures"]:
+					other_future.cancel()
+			return
+
+		if diff_name == None:
+			song["result"]["timings"]["audio"] = task_time
+		else:
+			song["osu_files"][diff_name] = task_result
+			song["result"]["timings"]["charts"] += task_time
+
+	def status(self, new_status):
+		"""
+			Class method:
+				Called after each step of convertSongs() to follow the progress.
+			Arguments:
+				new_status (str): what has just been done.
+			Return:
+				Nothing.
+		"""
+		self.__current_step += 1
+		if self.progress_callback != None:
+			self.progress_callback(self.__current_step, self.__total_steps, new_status)
+		else:
+			if self.__total_steps == 0:  # unknown total steps
+				percentage = 0
+			else:
+				percentage = int((self.__current_step/self.__total_steps) * 100)
+			print(f"[{percentage}%] {new_status}")
+
+def exportAudio(osu_map, audio_path, audio_backend="ffmpeg"):
+	"""
+		Method:
+			Task which creates the audio.mp3 of a song (see Osz_converter.exportAudio()). Runs in another process.
+		Arguments:
+			osu_map (Osu_map object): the song.
+			audio_path (str): where to create the mp3.
+			(optional) audio_backend (str): see Osz_converter. "ffmpeg" by default.
+		Return:
+			Nothing.
+	"""
+	Osz_converter(progress_callback=ignoreStatus, audio_backend=audio_backend).exportAudio(osu_map, audio_path)
+
+def getFileSize(file_path):
+	"""
+		Method:
+			Returns the size of a file, used to start the longest tasks first.
+		Arguments:
+			file_path (str): path to the file.
+		Return:
+			(int): the size in bytes, 0 if the file can't be read (the task will fail by itself).
+	"""
+	try:
+		return os.path.getsize(file_path)
+	except OSError:
+		return 0
+
+def ignoreStatus(current_step, total_steps, new_status):
+	"""
+		Method:
+			progress_callback which does nothing, for the Osz_converter used by the tasks.
+		Arguments:
+			current_step, total_steps (int), new_status (str): see Osz_converter.status().
+		Return:
+			Nothing.
+	"""
+	pass
+
+def redirectStdout():
+	"""
+		Method:
+			initializer of the processes of convertSongs(): their prints go to stderr.
+			redirect_stdout() in the main process isn't enough: the processes started with "spawn" (Windows, macOS) have their own sys.stdout.
+		Arguments:
+			None.
+		Return:
+			Nothing.
+	"""
+	sys.stdout = sys.stderr
+
+def removeTempAudio(song):
+	"""
+		Method:
+			Delete the temporary audio file of a song.
+		Arguments:
+			song (dict): the song, from Batch_converter.prepareSong().
+		Return:
+			Nothing.
+	"""
+	try:
+		os.remove(song["temp_audio_path"])
+	except OSError:
+		print(f"WARNING: error while trying to delete the temporary audio ('{song['temp_audio_path']}')")
+
+def runTimedTask(function, *arguments):
+	"""
+		Method:
+			Run a task and measure how long it takes. Runs in another process.
+		Arguments:
+			function (function): the task.
+			arguments: the arguments of function.
+		Return:
+			(tuple): (result of function, duration in seconds (float)).
+	"""
+	start_time = time.perf_counter()
+	result = function(*arguments)
+	return (result, time.perf_counter() - start_time)
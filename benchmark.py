@@ -0,0 +1,250 @@
+""" Benchmark of the conversion of charts, to measure the performance and compare it between 2 versions of the converter.
+
+Times jsonRemoveExtraData(), loadChartData(), getNotesFromPlayer() for each player, removeOverlaps(), optimizeBPMList(), getTimingIndex()
+and the whole exportOsuFile() for every map mode, on the charts of tests/ and on generated charts from 1k to 1M notes.
+The caches of fnf_converter are cleared before each run, so each measure is the one of a first export.
+
+Usage:
+	python benchmark.py                                     # run everything, write benchmark_results.json
+	python benchmark.py --sizes 1000 10000 --filter export  # only some benchmarks
+	python benchmark.py --compare old_results.json          # exit code 1 if a benchmark is slower by more than --threshold
+"""
+
+import argparse
+import fnf_converter
+from fnf_converter import Fnf_chart, Osu_map, jsonRemoveExtraData, loadChartData, map_modes
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+tests_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests")
+
+def clearCaches():
+	"""
+		Method:
+			Forget the charts already parsed by fnf_converter, so the next run parses them again.
+		Arguments:
+			None.
+		Return:
+			Nothing.
+	"""
+	fnf_converter.chart_cache.clear()
+	fnf_converter.sanitized_notes_cache.clear()
+	fnf_converter.timing_index_cache.clear()
+
+def compareResults(results, old_results, threshold, min_time):
+	"""
+		Method:
+			Compare the results with the ones of another run, and print the differences.
+		Arguments:
+			results (dict): the results of this run, from runBenchmarks().
+			old_results (dict): the results to compare with (same format).
+			threshold (float): a benchmark is slower if its time increased by more than this ratio (ex: 0.1 = 10%).
+			min_time (float): differences smaller than this time (in s) are ignored (noise).
+		Return:
+			(list of str): the names of the benchmarks which are slower.
+	"""
+	regressions = []
+	print(f"\n{'benchmark':<60} {'old (ms)':>10} {'new (ms)':>10} {'ratio':>7}")
+	for name in results.keys():
+		if not(name in old_results):
+			continue
+		old_time = old_results[name]["min"]
+		new_time = results[name]["min"]
+		ratio = new_time / old_time if old_time > 0 else 1
+		is_regression = ratio > 1 + threshold and new_time - old_time > min_time
+		if is_regression:
+			regressions.append(name)
+		print(f"{name:<60} {old_time*1000:>10.2f} {new_time*1000:>10.2f} {ratio:>7.2f}{'  SLOWER' if is_regression else ''}")
+	return regressions
+
+def createChart(file_path, notes_count, seed=0):
+	"""
+		Method:
+			Generate a FnF chart with random notes: 16 notes per section, 4 keys per player, some long notes, some overlapping notes and some BPM changes.
+			The same arguments always give the same chart.
+		Arguments:
+			file_path (str): where to create the JSON file.
+			notes_count (int): the amount of notes.
+			seed (int): seed of the random generator.
+		Return:
+			Nothing.
+	"""
+	generator = random.Random(seed)
+	sections = []
+	bpm = 150.0
+	offset = 0.0
+	for section_index in range((notes_count + 15) // 16):
+		step_length = 60000 / bpm / 4  # 16 steps per section
+		change_bpm = section_index > 0 and section_index % 64 == 0
+		if change_bpm:
+			bpm = generator.choice([120.0, 150.0, 180.0])
+		section_notes = []
+		for i in range(min(16, notes_count - section_index*16)):
+			note_offset = offset + generator.randrange(16) * step_length
+			length = generator.choice([0, 0, 0, 0, step_length * generator.randint(1, 8)])
+			section_notes.append([note_offset, generator.randrange(8), length])
+		section_notes.sort()
+		section = {"sectionNotes": section_notes, "mustHitSection": section_index % 2 == 0, "lengthInSteps": 16, "typeOfSection": 0, "altAnim": False}
+		if change_bpm:
+			section["changeBPM"] = True
+			section["bpm"] = bpm
+		sections.append(section)
+		offset += 16 * step_length
+
+	chart = {"song": {"song": "Benchmark", "bpm": 150.0, "speed": 2.5, "needsVoices": True, "player1": "bf", "player2": "dad", "notes": sections}}
+	with open(file_path, "w", encoding="utf-8") as file:
+		file.write(json.dumps(chart))
+
+def getBenchmarks(chart_name, chart_path, output_path):
+	"""
+		Method:
+			Returns the benchmarks of 1 chart.
+		Arguments:
+			chart_name (str): name of the chart in the results.
+			chart_path (str): path to the chart.
+			output_path (str): folder where exportOsuFile() creates the .osu files.
+		Return:
+			(list of tuples): (name (str), setup (function which returns the arguments of the function), function). setup isn't timed.
+	"""
+	osu_map = Osu_map("Benchmark", "Benchmark", "Benchmark", "", "")
+	fnf_chart = Fnf_chart(chart_path, "", "", osu_map, 41)
+
+	# what to do before each run
+	def setupParse(*arguments):  # the chart has to be parsed again
+		def setup():
+			clearCaches()
+			return arguments
+		return setup
+	def setupParsed(get_arguments):  # the chart is already parsed, the arguments are copied since the functions may modify them
+		def setup():
+			loadChartData(chart_path)
+			return get_arguments()
+		return setup
+	def setupTimingIndex():  # the chart is already parsed, but the timing points have to be built again
+		loadChartData(chart_path)
+		fnf_converter.timing_index_cache.clear()
+		return ()
+	def setupExport(map_mode):
+		def setup():
+			clearCaches()
+			return (Fnf_chart(chart_path, "", "", osu_map, map_mode), )
+		return setup
+
+	benchmarks = [
+		(f"{chart_name}/jsonRemoveExtraData", setupParse(chart_path), jsonRemoveExtraData),
+		(f"{chart_name}/loadChartData", setupParse(chart_path), loadChartData)
+	]
+	for player_id in [0, 1, 2]:
+		benchmarks.append((f"{chart_name}/getNotesFromPlayer/{player_id}", setupParse(player_id, 4), fnf_chart.getNotesFromPlayer))
+	notes_list = fnf_chart.getNotesFromPlayer(0, 8)
+	benchmarks.append((f"{chart_name}/removeOverlaps", setupParsed(lambda: ([note[:] for note in notes_list], 8)), fnf_chart.removeOverlaps))
+	bpm_list = fnf_chart.getBPMList()
+	benchmarks.append((f"{chart_name}/optimizeBPMList", setupParsed(lambda: ([bpm_point[:] for bpm_point in bpm_list], )), fnf_chart.optimizeBPMList))
+	benchmarks.append((f"{chart_name}/getTimingIndex", setupTimingIndex, fnf_chart.getTimingIndex))
+	for map_mode in map_modes:
+		benchmarks.append((f"{chart_name}/exportOsuFile/{map_mode}", setupExport(map_mode), lambda chart: chart.exportOsuFile(output_path, "Benchmark", "Benchmark", "")))
+	return benchmarks
+
+def getMetadata():
+	"""
+		Method:
+			Returns information about where the benchmark runs, saved with the results.
+		Arguments:
+			None.
+		Return:
+			(dict): the metadata.
+	"""
+	try:
+		commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip()
+	except OSError:  # git not installed
+		commit = ""
+	return {
+		"commit": commit,
+		"date": time.strftime("%Y-%m-%d %H:%M:%S"),
+		"python": platform.python_version(),
+		"platform": platform.platform()
+	}
+
+def main(argv=None):
+	"""
+		Method:
+			Where the benchmark starts.
+		Arguments:
+			argv (list of str): the arguments (sys.argv[1:] by default).
+		Return:
+			(int): the exit code, 1 if there are regressions.
+	"""
+	parser = argparse.ArgumentParser(description="Benchmark of the conversion of charts.")
+	parser.add_argument("-o", "--output", default="benchmark_results.json", help="where to write the results (default: benchmark_results.json)")
+	parser.add_argument("-r", "--repeats", type=int, default=5, help="amount of runs of each benchmark, the best one is kept (default: 5, only 1 for charts of 100k notes or more)")
+	parser.add_argument("-s", "--sizes", type=int, nargs="*", default=[1000, 10000, 100000, 1000000], help="amount of notes of the generated charts (default: 1000 10000 100000 1000000)")
+	parser.add_argument("-f", "--filter", default="", help="only run the benchmarks whose name contains this text")
+	parser.add_argument("-c", "--compare", default=None, help="results of a previous run to compare with")
+	parser.add_argument("-t", "--threshold", type=float, default=0.1, help="a benchmark slower by more than this ratio is a regression (default: 0.1 = 10%%)")
+	parser.add_argument("--min-time", type=float, default=0.001, help="differences smaller than this time (in s) are ignored (default: 0.001)")
+	arguments = parser.parse_args(argv)
+
+	with tempfile.TemporaryDirectory() as temp_folder:
+		# charts: the ones of tests/, then the generated ones
+		charts = []  # list of (name, path, repeats)
+		for file_name in sorted(os.listdir(tests_folder)):
+			if file_name.endswith(".json") and file_name != "config.json":
+				charts.append((file_name, os.path.join(tests_folder, file_name), arguments.repeats))
+		for notes_count in arguments.sizes:
+			chart_path = os.path.join(temp_folder, f"generated-{notes_count}.json")
+			createChart(chart_path, notes_count)
+			charts.append((f"generated-{notes_count}", chart_path, arguments.repeats if notes_count < 100000 else 1))
+
+		output_path = os.path.join(temp_folder, "output")
+		os.makedirs(output_path)
+		results = {}
+		for chart_name, chart_path, repeats in charts:
+			benchmarks = [benchmark for benchmark in getBenchmarks(chart_name, chart_path, output_path) if arguments.filter in benchmark[0]]
+			results.update(runBenchmarks(benchmarks, repeats))
+		clearCaches()
+
+	with open(arguments.output, "w", encoding="utf-8") as file:
+		json.dump({"metadata": getMetadata(), "results": results}, file, indent=4)
+	print(f"Results written in '{arguments.output}'.")
+
+	if arguments.compare != None:
+		with open(arguments.compare, "r", encoding="utf-8") as file:
+			old_results = json.loads(file.read())["results"]
+		regressions = compareResults(results, old_results, arguments.threshold, arguments.min_time)
+		if len(regressions) > 0:
+			print(f"\n{len(regressions)} benchmark(s) slower by more than {arguments.threshold*100:g}%: {', '.join(regressions)}")
+			return 1
+		print("\nNo regression.")
+	return 0
+
+def runBenchmarks(benchmarks, repeats):
+	"""
+		Method:
+			Run benchmarks and print their times.
+		Arguments:
+			benchmarks (list of tuples): from getBenchmarks().
+			repeats (int): amount of runs of each benchmark.
+		Return:
+			(dict): {name: {"min": best time (s), "median": median time (s), "repeats": int}}
+	"""
+	results = {}
+	for name, setup, function in benchmarks:
+		times = []
+		for i in range(repeats):
+			arguments = setup()
+			start_time = time.perf_counter()
+			function(*arguments)
+			times.append(time.perf_counter() - start_time)
+		results[name] = {"min": min(times), "median": statistics.median(times), "repeats": repeats}
+		print(f"{name:<60} {results[name]['min']*1000:>10.2f} ms", flush=True)
+	return results
+
+if __name__ == "__main__":
+	sys.exit(main())
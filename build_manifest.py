@@ -0,0 +1,128 @@
+""" Module which includes the manifest used to reuse the files of the previous export of a mapset (incremental export). """
+
+import hashlib
+import json
+import os
+
+class Build_manifest:
+	"""
+		Object:
+			Represents the build folder of a mapset: the files generated by its last export (audio.mp3, .osu files), and manifest.json,
+			which keeps the fingerprint of everything used to generate each file (see getFingerprint()).
+			A file can be reused by the next export if its fingerprint hasn't changed.
+		Arguments:
+			folder_path (str): the build folder. Created when the manifest is saved.
+	"""
+
+	def __init__(self, folder_path):
+		self.folder_path = folder_path
+		self.entries = {}  # {file name: fingerprint (str)}
+
+		self.load()
+
+	def getFilePath(self, name):
+		"""
+			Class method:
+				Returns the path of a file of the build folder.
+			Arguments:
+				name (str): the file name.
+			Return:
+				(str): the path.
+		"""
+		return os.path.join(self.folder_path, name)
+
+	def isUpToDate(self, name, fingerprint, file_path=None):
+		"""
+			Class method:
+				Tell if a file of the previous export can be reused: it has the same fingerprint, and it still exists.
+			Arguments:
+				name (str): the name of the entry.
+				fingerprint (str): the fingerprint of the file to generate now.
+				(optional) file_path (str): where the file is, if it isn't in the build folder. By default, the file of the build folder named name.
+			Return:
+				(bool): True if the file can be reused.
+		"""
+		if file_path == None:
+			file_path = self.getFilePath(name)
+		return self.entries.get(name) == fingerprint and os.path.isfile(file_path)
+
+	def load(self):
+		"""
+			Class method:
+				Read the manifest of the build folder. If it doesn't exist (or can't be read), the manifest is empty: every file will be generated.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		try:
+			with open(self.getFilePath("manifest.json"), "r", encoding="utf-8") as file:
+				self.entries = json.loads(file.read())["entries"]
+		except (OSError, ValueError, KeyError, TypeError):
+			self.entries = {}
+
+	def removeEntries(self, names):
+		"""
+			Class method:
+				Forget the fingerprints of some files (for example the ones about to be generated again).
+			Arguments:
+				names (list of str): the names of the entries.
+			Return:
+				Nothing.
+		"""
+		for name in names:
+			self.entries.pop(name, None)
+
+	def removeUnusedFiles(self, names):
+		"""
+			Class method:
+				Delete the files of the build folder which aren't used anymore (for example a removed difficulty), and forget their fingerprints.
+			Arguments:
+				names (list of str): the files to keep.
+			Return:
+				Nothing.
+		"""
+		for name in list(self.entries.keys()):
+			if not(name in names):
+				self.entries.pop(name)
+		for name in os.listdir(self.folder_path):
+			if name != "manifest.json" and not(name in names) and os.path.isfile(self.getFilePath(name)):
+				os.remove(self.getFilePath(name))
+
+	def save(self):
+		"""
+			Class method:
+				Write the manifest in the build folder. It's written under another name first, so an unfinished write is never read.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		os.makedirs(self.folder_path, exist_ok=True)
+		temp_path = self.getFilePath(f"manifest.json.{os.getpid()}.tmp")
+		with open(temp_path, "w", encoding="utf-8") as file:
+			json.dump({"entries": self.entries}, file, indent=4, sort_keys=True)
+		os.replace(temp_path, self.getFilePath("manifest.json"))
+
+	def setEntry(self, name, fingerprint):
+		"""
+			Class method:
+				Save the fingerprint of a generated file.
+			Arguments:
+				name (str): the name of the entry.
+				fingerprint (str): the fingerprint, from getFingerprint().
+			Return:
+				Nothing.
+		"""
+		self.entries[name] = fingerprint
+
+def getFingerprint(data):
+	"""
+		Method:
+			Returns the fingerprint of the inputs of a generated file.
+		Arguments:
+			data: everything used to generate the file, that can be written as JSON (the files themselves are identified by their hash, see audio_cache.getFileHash()).
+		Return:
+			(str): the fingerprint (a hash).
+	"""
+	return hashlib.sha256(json.dumps(data, sort_keys=True).encode("utf-8")).hexdigest()
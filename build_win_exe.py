@@ -20,7 +20,6 @@ with open("config.json", "r") as file:  # all settings from config.json
 build_path = "dist/main"  # where the .exe and its dependencies are located
 os.mkdir(f"{build_path}/output", 0o777)
 shutil.copy("config.json", f"{build_path}/config.json") 
-shutil.copy("nothing2.ogg", f"{build_path}/nothing2.ogg")
 shutil.copy("VERY_IMPORTANT_READ_ME.txt", f"{build_path}/VERY_IMPORTANT_READ_ME.txt")
 
 # make the .zip file
@@ -0,0 +1,118 @@
+""" Module which includes the cancellation of an export, checked by the export itself (no tracing of the export thread). """
+
+import threading
+
+class Export_cancelled(SystemExit):
+	"""
+		Object:
+			Raised in the export thread when the export has been cancelled (see Cancel_token.check()).
+			It's a SystemExit, so it stops the export without opening a Crash_window.
+	"""
+	pass
+
+class Cancel_token:
+	"""
+		Object:
+			Tells an export that it has to stop. cancel() is called by another thread (for example the Cancel button),
+			and the export calls check() at each step and regularly inside the long loops, so it stops at the next check.
+			The subprocesses registered with addProcess() (for example ffmpeg) are terminated as soon as cancel() is called.
+		Arguments:
+			None.
+	"""
+
+	def __init__(self):
+		self.__event = threading.Event()
+		self.__processes = []  # running subprocesses (subprocess.Popen) to terminate when cancelled
+		self.__lock = threading.Lock()
+
+	def addProcess(self, process):
+		"""
+			Class method:
+				Register a running subprocess, terminated if the export is cancelled. If it's already cancelled, the subprocess is terminated now.
+			Arguments:
+				process (subprocess.Popen): the subprocess.
+			Return:
+				Nothing.
+		"""
+		with self.__lock:
+			self.__processes.append(process)
+			if self.__event.is_set():
+				terminateProcess(process)
+
+	def cancel(self):
+		"""
+			Class method:
+				Ask the export to stop, and terminate its registered subprocesses.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		with self.__lock:
+			self.__event.set()
+			for process in self.__processes:
+				terminateProcess(process)
+
+	def check(self):
+		"""
+			Class method:
+				Raise Export_cancelled if cancel() has been called. Called by the export between its steps.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		if self.__event.is_set():
+			raise Export_cancelled("Export cancelled.")
+
+	def isCancelled(self):
+		"""
+			Class method:
+				Returns True if cancel() has been called.
+			Arguments:
+				None.
+			Return:
+				(bool)
+		"""
+		return self.__event.is_set()
+
+	def removeProcess(self, process):
+		"""
+			Class method:
+				Forget a subprocess registered with addProcess() (when it's finished).
+			Arguments:
+				process (subprocess.Popen): the subprocess.
+			Return:
+				Nothing.
+		"""
+		with self.__lock:
+			if process in self.__processes:
+				self.__processes.remove(process)
+
+	def reset(self):
+		"""
+			Class method:
+				Forget a previous cancellation. Called at the beginning of an export.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		with self.__lock:
+			self.__event.clear()
+			self.__processes = []
+
+def terminateProcess(process):
+	"""
+		Method:
+			Terminate a subprocess if it's still running.
+		Arguments:
+			process (subprocess.Popen): the subprocess.
+		Return:
+			Nothing.
+	"""
+	if process.poll() == None:
+		try:
+			process.terminate()
+		except OSError:  # finished in the meantime
+			pass
@@ -0,0 +1,249 @@
+""" Command line interface to convert Friday Night Funkin' songs into .osz without the GUI (tkinter is never imported).
+
+Each input is either a song folder or a manifest (.json file).
+
+Song folder: every chart (.json) of the folder becomes a difficulty, for each map mode given with --map-mode.
+The audio files are the ones ending by 'Inst.ogg' (audio 1) and 'Voices.ogg' (audio 2), the background is the first .jpg/.jpeg/.png.
+
+Manifest: a list of songs (or {"songs": [...]}), where each song is a dict like:
+	{
+		"title": "Milf", "artist": "Kawai Sprite",
+		"audio1": "milf/Inst.ogg", "audio2": "milf/Voices.ogg",
+		"difficulties": {"Hard": [41, "milf/milf-hard.json"], "Hard Co-op": [44, "milf/milf-hard.json"]}
+	}
+Optional keys: creator, tags, audio1_volume, audio2_volume, background, bpm, meter, offset. Paths are relative to the manifest.
+
+All songs are converted at the same time by a Batch_converter.
+The progress is written on stdout as 1 JSON object per line, with an "event" key: "progress", "done", "error" and "summary" (at the end).
+Other messages (warnings...) are written on stderr. A report with the timings of each song is also written (see --report).
+"""
+
+import argparse
+from audio_cache import Audio_cache
+from batch_converter import Batch_converter
+from contextlib import redirect_stdout
+from fnf_converter import Osu_map, audio_backends, loadChartData, map_modes as valid_map_modes
+import json
+import os
+import sys
+import time
+import traceback
+
+events_file = sys.stdout  # where printEvent() writes, the prints of the converter go to stderr
+
+def createOsuMap(song):
+	"""
+		Method:
+			Create the Osu_map of a song.
+		Arguments:
+			song (dict): the song, from getSongFromFolder() or getSongsFromManifest().
+		Return:
+			(Osu_map): the mapset with all its difficulties.
+	"""
+	osu_map = Osu_map(
+		song["title"],
+		song.get("artist", ""),
+		song.get("creator", ""),
+		song.get("tags", ""),
+		song["audio1"],
+		song.get("audio2", ""),
+		song.get("audio1_volume", 100),
+		song.get("audio2_volume", 100),
+		song.get("background", ""),
+		song.get("bpm", 0),
+		song.get("meter", 4),
+		song.get("offset", 0)
+	)
+	for diff_name in song["difficulties"].keys():
+		map_mode, chart_path = song["difficulties"][diff_name]
+		if not(int(map_mode) in valid_map_modes):
+			raise ValueError(f"Invalid map mode for the difficulty '{diff_name}': {map_mode}")
+		osu_map.addDifficulty(diff_name, int(map_mode), chart_path)
+	return osu_map
+
+def getSongFromFolder(folder_path, map_modes, creator):
+	"""
+		Method:
+			Create a song from a folder which contains the charts and the audio files of the song (see the module doc).
+		Arguments:
+			folder_path (str): path to the folder. Its name is used as song title.
+			map_modes (list of int): the map modes to create for each chart.
+			creator (str): the osu! username to put in the .osu files.
+		Return:
+			(dict): the song, same format than in a manifest.
+	"""
+	song = {"title": os.path.basename(os.path.normpath(folder_path)), "creator": creator, "audio1": "", "audio2": "", "background": "", "difficulties": {}}
+	ogg_paths = []
+
+	for file_name in sorted(os.listdir(folder_path)):
+		file_path = os.path.join(folder_path, file_name)
+		extension = os.path.splitext(file_name)[1].lower()
+
+		if extension == ".ogg":
+			ogg_paths.append(file_path)
+			if file_name.lower().endswith("inst.ogg"):
+				song["audio1"] = file_path
+			elif file_name.lower().endswith("voices.ogg"):
+				song["audio2"] = file_path
+		elif extension in [".jpg", ".jpeg", ".png"] and song["background"] == "":
+			song["background"] = file_path
+		elif extension == ".json" and file_name.lower() != "events.json" and isChart(file_path):
+			for map_mode in map_modes:
+				if len(map_modes) == 1:
+					diff_name = os.path.splitext(file_name)[0]
+				else:
+					diff_name = f"{os.path.splitext(file_name)[0]} ({map_mode})"
+				song["difficulties"][diff_name] = [map_mode, file_path]
+
+	# no Inst/Voices files: use the 2 first .ogg
+	if song["audio1"] == "" and song["audio2"] == "":
+		ogg_paths = ogg_paths[0:2] + ["", ""]
+		song["audio1"], song["audio2"] = ogg_paths[0], ogg_paths[1]
+	elif song["audio1"] == "":  # only Voices
+		song["audio1"], song["audio2"] = song["audio2"], ""
+
+	if song["audio1"] == "":
+		raise ValueError(f"No .ogg file found in '{folder_path}'.")
+	if song["difficulties"] == {}:
+		raise ValueError(f"No chart found in '{folder_path}'.")
+
+	return song
+
+def getSongsFromManifest(manifest_path, creator):
+	"""
+		Method:
+			Read the songs of a manifest (see the module doc). Relative paths become relative to the manifest folder.
+		Arguments:
+			manifest_path (str): path to the manifest.
+			creator (str): the osu! username used for the songs which don't define it.
+		Return:
+			(list of dict): the songs.
+	"""
+	with open(manifest_path, "r", encoding="utf-8") as file:
+		manifest_data = json.loads(file.read())
+	if type(manifest_data) == dict:
+		manifest_data = manifest_data["songs"]
+
+	manifest_folder = os.path.dirname(os.path.abspath(manifest_path))
+	def getPath(file_path):  # "" stays "" (no file)
+		if file_path == "" or os.path.isabs(file_path):
+			return file_path
+		return os.path.join(manifest_folder, file_path)
+
+	songs = []
+	for song in manifest_data:
+		song = dict(song)  # copy
+		song.setdefault("creator", creator)
+		for path_key in ["audio1", "audio2", "background"]:
+			song[path_key] = getPath(song.get(path_key, ""))
+		song["difficulties"] = {diff_name: [map_mode, getPath(chart_path)] for diff_name, (map_mode, chart_path) in song["difficulties"].items()}
+		songs.append(song)
+	return songs
+
+def isChart(file_path):
+	"""
+		Method:
+			Tell if a JSON file is a FnF chart (it has a 'song' object with 'notes').
+		Arguments:
+			file_path (str): path to the JSON file.
+		Return:
+			(bool): True if it's a chart.
+	"""
+	try:
+		json_data = loadChartData(file_path)
+		return type(json_data["song"]) == dict and "notes" in json_data["song"]
+	except Exception:
+		return False
+
+def main(argv=None):
+	"""
+		Method:
+			Where the command line program starts. Returns the exit code (0 if all songs were converted, 1 otherwise).
+		Arguments:
+			argv (list of str): the arguments (sys.argv[1:] by default).
+		Return:
+			(int): the exit code.
+	"""
+	parser = argparse.ArgumentParser(description="Convert Friday Night Funkin' songs into osu!mania mapsets (.osz) without GUI.", epilog="See the documentation of cli.py for the manifest format.")
+	parser.add_argument("inputs", nargs="+", help="song folders and/or manifests (.json)")
+	parser.add_argument("-o", "--output", default="output", help="where to create the .osz (default: output)")
+	parser.add_argument("-c", "--creator", default="", help="osu! username to put in the maps")
+	parser.add_argument("-m", "--map-mode", type=int, action="append", choices=valid_map_modes, help="map mode to create for each chart of a song folder, can be used several times (default: 41)")
+	parser.add_argument("-w", "--workers", type=int, default=0, help="amount of processes used to convert the songs (default: 1 per CPU core)")
+	parser.add_argument("-r", "--report", default=None, help="where to write the report (default: report.json in the output folder)")
+	parser.add_argument("--audio-backend", default="ffmpeg", choices=audio_backends, help="how to create the audio.mp3: 'ffmpeg' mixes and encodes in 1 pass (default), 'stream' mixes by small chunks (low memory), 'pydub' decodes the whole audio in Python")
+	parser.add_argument("--audio-cache-folder", default="cache", help="where to keep the generated audio.mp3 (default: cache)")
+	parser.add_argument("--audio-cache-max-size", type=float, default=512, help="maximum size of the audio cache in MB (default: 512)")
+	parser.add_argument("--no-audio-cache", action="store_true", help="don't use the audio cache")
+	arguments = parser.parse_args(argv)
+
+	start_time = time.perf_counter()
+	map_modes = arguments.map_mode if arguments.map_mode != None else [41]
+	report_path = arguments.report if arguments.report != None else os.path.join(arguments.output, "report.json")
+	audio_cache = Audio_cache(arguments.audio_cache_folder, int(arguments.audio_cache_max_size*1024*1024), not(arguments.no_audio_cache))
+
+	# read the inputs
+	osu_maps = []
+	failed_count = 0  # inputs which can't be read
+	for input_path in arguments.inputs:
+		try:
+			with redirect_stdout(sys.stderr):
+				if os.path.isdir(input_path):
+					songs = [getSongFromFolder(input_path, map_modes, arguments.creator)]
+				else:
+					songs = getSongsFromManifest(input_path, arguments.creator)
+				osu_maps += [createOsuMap(song) for song in songs]
+		except Exception:
+			printEvent("error", song=input_path, osz=None, error=traceback.format_exc())
+			failed_count += 1
+
+	# convert
+	os.makedirs(arguments.output, exist_ok=True)
+	batch_converter = Batch_converter(arguments.workers, audio_cache, progress_callback=printProgress, song_callback=printSongResult, audio_backend=arguments.audio_backend)
+	with redirect_stdout(sys.stderr):
+		report = batch_converter.convertSongs(osu_maps, arguments.output, report_path)
+
+	failed_count += report["failed"]
+	printEvent("summary", songs=len(report["songs"]), succeeded=report["succeeded"], failed=failed_count, report=report_path, time=time.perf_counter()-start_time)
+	return 0 if failed_count == 0 else 1
+
+def printEvent(event, **data):
+	"""
+		Method:
+			Write an event on stdout (events_file), as 1 line of JSON. The line is written at once, so the lines of several processes don't mix.
+		Arguments:
+			event (str): the event type.
+			data: the other values of the event.
+		Return:
+			Nothing.
+	"""
+	events_file.write(json.dumps({"event": event, **data}) + "\n")
+	events_file.flush()
+
+def printProgress(current_step, total_steps, status):
+	"""
+		Method:
+			progress_callback of the Batch_converter: write a "progress" event.
+		Arguments:
+			current_step, total_steps (int), status (str): from Batch_converter.status().
+		Return:
+			Nothing.
+	"""
+	printEvent("progress", step=current_step, total=total_steps, status=status)
+
+def printSongResult(result):
+	"""
+		Method:
+			song_callback of the Batch_converter: write a "done" or "error" event.
+		Arguments:
+			result (dict): the result of the song (see Batch_converter.convertSongs()).
+		Return:
+			Nothing.
+	"""
+	if result["error"] == None:
+		printEvent("done", song=result["title"], osz=result["osz"], timings=result["timings"])
+	else:
+		printEvent("error", song=result["title"], osz=None, error=result["error"])
+
+if __name__ == "__main__":
+	sys.exit(main())
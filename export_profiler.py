@@ -0,0 +1,115 @@
+""" Module which includes the profiler used to find where a slow export spends its time. """
+
+import cProfile
+import os
+import sys
+import threading
+
+profile_environment_variable = "FNF2OSU_PROFILE"  # if defined (and not "0"), the exports are profiled
+
+class Export_profiler:
+	"""
+		Object:
+			Profiles an export in 2 ways at the same time:
+			- cProfile, on the thread which calls start() (the .prof file can be opened with pstats, snakeviz...).
+			- a sampling profiler: every sampling_interval, the stacks of all the threads (including the audio thread) are saved.
+			  They're written as collapsed stacks (1 line per stack: "thread;function;function count"), which is what flamegraph.pl and speedscope read.
+			The work done in other processes isn't profiled.
+		Arguments:
+			(optional) sampling_interval (float): time between 2 samples, in s. 0.005 by default.
+	"""
+
+	def __init__(self, sampling_interval=0.005):
+		self.sampling_interval = sampling_interval
+
+		self.__profile = None  # cProfile.Profile in progress
+		self.__stacks = {}  # {collapsed stack (str): amount of samples}
+		self.__sampler_thread = None
+		self.__stop_event = threading.Event()
+
+	def sampleStacks(self):
+		"""
+			Class method:
+				Loop of the sampling thread: save the stack of each other thread until stop() is called.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		sampler_id = threading.get_ident()
+		while not(self.__stop_event.wait(self.sampling_interval)):
+			thread_names = {thread.ident: thread.name for thread in threading.enumerate()}
+			for thread_id, frame in sys._current_frames().items():
+				if thread_id == sampler_id:
+					continue
+				stack = []
+				while frame != None:
+					code = frame.f_code
+					stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+					frame = frame.f_back
+				stack.append(thread_names.get(thread_id, str(thread_id)))
+				collapsed_stack = ";".join(reversed(stack))  # from the root to the current function
+				self.__stacks[collapsed_stack] = self.__stacks.get(collapsed_stack, 0) + 1
+
+	def start(self):
+		"""
+			Class method:
+				Start profiling.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		self.__stacks = {}
+		self.__stop_event.clear()
+		self.__sampler_thread = threading.Thread(target=self.sampleStacks, name="Export_profiler", daemon=True)
+		self.__sampler_thread.start()
+		self.__profile = cProfile.Profile()
+		self.__profile.enable()
+
+	def stop(self):
+		"""
+			Class method:
+				Stop profiling. Do nothing if it isn't started.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		if self.__profile != None:
+			self.__profile.disable()
+		if self.__sampler_thread != None:
+			self.__stop_event.set()
+			self.__sampler_thread.join()
+			self.__sampler_thread = None
+
+	def writeFiles(self, base_path):
+		"""
+			Class method:
+				Write the results of the profiling: <base_path>.prof (cProfile) and <base_path>.folded (collapsed stacks).
+			Arguments:
+				base_path (str): path of the files, without extension.
+			Return:
+				(list of str): the paths of the written files.
+		"""
+		written_paths = []
+		if self.__profile != None:
+			self.__profile.dump_stats(f"{base_path}.prof")
+			written_paths.append(f"{base_path}.prof")
+
+		with open(f"{base_path}.folded", "w", encoding="utf-8") as file:
+			for collapsed_stack in sorted(self.__stacks.keys()):
+				file.write(f"{collapsed_stack} {self.__stacks[collapsed_stack]}\n")
+		written_paths.append(f"{base_path}.folded")
+		return written_paths
+
+def isProfilingEnabled(setting=False):
+	"""
+		Method:
+			Tell if the exports have to be profiled: if the setting is True, or if the environment variable FNF2OSU_PROFILE is defined (and isn't "0").
+		Arguments:
+			(optional) setting (bool): the value from config.json or from the command line. False by default.
+		Return:
+			(bool): True to profile the exports.
+	"""
+	return bool(setting) or not(os.environ.get(profile_environment_variable, "0") in ["", "0"])
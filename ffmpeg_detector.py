@@ -0,0 +1,110 @@
+""" Module which includes the detection of ffmpeg. The result is saved in a small state file, so ffmpeg isn't run each time the program starts. """
+
+import json
+import os
+import shutil
+import subprocess
+
+def detectFfmpeg(ffmpeg_command="ffmpeg", state_file_path=None):
+	"""
+		Method:
+			Find ffmpeg with shutil.which() and check that it works with "ffmpeg -version".
+			When ffmpeg is found, the result is saved in the state file. It's used again as long as the PATH doesn't change and the ffmpeg found
+			last time still has the same modification time, so ffmpeg is only run after it's installed, updated or moved.
+			When ffmpeg isn't found, nothing is saved: it may be installed later in a folder already in the PATH.
+		Arguments:
+			(optional) ffmpeg_command (str): name or path of the ffmpeg executable. "ffmpeg" by default.
+			(optional) state_file_path (str): where the result is saved. None (default) = not saved, ffmpeg is checked each time.
+		Return:
+			(str): the version of ffmpeg (1st line of "ffmpeg -version"), or None if ffmpeg isn't found or doesn't work.
+	"""
+	path_variable = os.environ.get("PATH", "")
+	state = loadState(state_file_path)
+	if state != None and state["ffmpeg_command"] == ffmpeg_command and state["path_variable"] == path_variable and getModificationTime(state["ffmpeg_path"]) == state["modification_time"]:
+		return state["version"]  # same ffmpeg as last time
+
+	ffmpeg_path = shutil.which(ffmpeg_command)
+	if ffmpeg_path == None:  # not found
+		return None
+	modification_time = getModificationTime(ffmpeg_path)
+	version = getFfmpegVersion(ffmpeg_path)
+	if version != None and state_file_path != None:
+		saveState(state_file_path, {"ffmpeg_command": ffmpeg_command, "ffmpeg_path": ffmpeg_path, "modification_time": modification_time, "path_variable": path_variable, "version": version})
+	return version
+
+def getFfmpegVersion(ffmpeg_path):
+	"""
+		Method:
+			Run "ffmpeg -version" to check that ffmpeg works.
+		Arguments:
+			ffmpeg_path (str): path of the ffmpeg executable.
+		Return:
+			(str): the 1st line of the output (ex: "ffmpeg version 6.0 ..."), or None if ffmpeg failed.
+	"""
+	try:
+		process = subprocess.run([ffmpeg_path, "-version"], stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, timeout=10)
+	except (OSError, subprocess.TimeoutExpired):  # not executable, or stuck
+		return None
+	if process.returncode != 0:
+		return None
+	output_lines = process.stdout.decode("utf-8", "replace").splitlines()
+	if len(output_lines) == 0:
+		return None
+	return output_lines[0].strip()
+
+def getModificationTime(file_path):
+	"""
+		Method:
+			Returns the modification time of a file.
+		Arguments:
+			file_path (str): path of the file.
+		Return:
+			(int): the modification time in ns, or None if the file doesn't exist.
+	"""
+	try:
+		return os.stat(file_path).st_mtime_ns
+	except (OSError, TypeError):  # TypeError: file_path is None
+		return None
+
+def loadState(state_file_path):
+	"""
+		Method:
+			Read the state file written by detectFfmpeg().
+		Arguments:
+			state_file_path (str): path of the state file, or None.
+		Return:
+			(dict): the saved state, or None if there isn't any (or if it can't be read).
+	"""
+	if state_file_path == None:
+		return None
+	try:
+		with open(state_file_path, "r", encoding="utf-8") as file:
+			state = json.loads(file.read())
+	except (OSError, ValueError):
+		return None
+	for key in ["ffmpeg_command", "ffmpeg_path", "modification_time", "path_variable", "version"]:
+		if not(isinstance(state, dict)) or not(key in state):  # written by another version
+			return None
+	return state
+
+def saveState(state_file_path, state):
+	"""
+		Method:
+			Write the state file. It's written under another name first, so an unfinished write is never read.
+			Errors are ignored: ffmpeg will be checked again next time.
+		Arguments:
+			state_file_path (str): path of the state file.
+			state (dict): what to save.
+		Return:
+			Nothing.
+	"""
+	temp_path = f"{state_file_path}.{os.getpid()}.tmp"
+	try:
+		folder_path = os.path.dirname(state_file_path)
+		if folder_path != "":
+			os.makedirs(folder_path, exist_ok=True)
+		with open(temp_path, "w", encoding="utf-8") as file:
+			json.dump(state, file, indent=4, sort_keys=True)
+		os.replace(temp_path, state_file_path)
+	except OSError:
+		print(f"WARNING: impossible to write '{state_file_path}'.")
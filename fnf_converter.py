@@ -1,13 +1,35 @@
 """ Module which includes classes and functions needed to convert Friday Night Funkin' charts into .osz (osu mapsets). """
 
-from crash_window import Crash_window
+from audio_cache import getFileHash
+from build_manifest import Build_manifest, getFingerprint
+from cancel_token import Cancel_token
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from export_profiler import Export_profiler
+import io
 import json
 from math import log
+import mmap
 import os
-from pydub import AudioSegment
 import traceback
 import shutil
-from zipfile import ZipFile
+from stage_timer import Stage_timer
+import subprocess
+import tempfile
+import threading
+from timing_index import Timing_index
+from zipfile import ZipFile, ZIP_DEFLATED, ZIP_STORED
+
+audio_backends = ["ffmpeg", "pydub", "stream"]  # the ways to create the audio.mp3, see Osz_converter.exportAudio()
+build_folder_name = ".build"  # with incremental exports, where the files of the last export of each mapset are kept (in the folder of the .osz)
+chart_cache = {}  # parsed charts, shared by all Fnf_chart objects: {absolute path: ((mtime, size), json_data)}, the most recently used last. See loadChartData()
+chart_cache_size = 16  # maximum amount of charts in chart_cache: the least recently used one is forgotten first, with its entries in the other caches (see forgetChart())
+sanitized_notes_cache = {}  # cleaned notes of the charts in chart_cache: {absolute path: (json_data, sanitized notes)}. See loadSanitizedNotes()
+chart_song_keys = ["bpm", "notes", "speed"]  # the keys of json_data["song"] kept by compactChartData()
+chart_section_keys = ["bpm", "changeBPM", "lengthInSteps", "mustHitSection", "sectionBeats", "sectionNotes"]  # the keys of each section kept by compactChartData()
+converter_hash = None  # hash of the code of the converter, see getConverterHash()
+ffmpeg_path = "ffmpeg"  # the ffmpeg executable used by the "ffmpeg" audio backend
+map_modes = [41, 42, 43, 44, 45, 51, 52, 61, 62, 71, 72, 81, 82, 91, 92]  # all the map modes of Fnf_chart, see Fnf_chart.__init__()
+timing_index_cache = {}  # timing points of the charts in chart_cache: {(absolute path, custom BPM): (json_data, Timing_index)}. See Fnf_chart.getTimingIndex()
 
 class Fnf_chart:
 	"""
@@ -25,7 +47,7 @@ class Fnf_chart:
 				where x is the keys_count
 	"""
 	def __init__(self, map_path, song_inst_path, song_voices_path, osu_object, map_mode):
-		assert map_mode in [41,42,43,44,45,51,52,61,62,71,72,81,82,91,92]  # verify mode input
+		assert map_mode in map_modes  # verify mode input
 		
 		self.map_path = map_path  # path to the json
 		self.song_inst_path = song_inst_path
@@ -37,6 +59,12 @@ class Fnf_chart:
 		self.offset = -osu_object.offset  # In the inputs we move audio. In reality we move the notes. (applied only at .osu files output)
 		self.custom_bpm = osu_object.custom_bpm
 		self.default_bpm = 120
+		self.cancel_token = None  # Cancel_token of the export in progress, checked in the long loops. Set by Osz_converter
+
+	def __getstate__(self):
+		state = self.__dict__.copy()
+		state["cancel_token"] = None  # can't be sent to another process (the difficulties in other processes can't be cancelled)
+		return state
 
 	def concatenateCharts(self, notes_left, notes_right, keys_count):
 		"""
@@ -48,7 +76,7 @@ class Fnf_chart:
 			Return:
 				Same than self.getNotesFromPlayer(), a chart including both of the inputs in separate columns.
 				Returns a chart for (2 * <keys_count>) keys.
-				The list is sorted by ascending offset.
+				The list is sorted by ascending offset (then by column and length).
 		"""
 
 		# What we want, a list of lists like [offset (int), column (int), length (int)]
@@ -63,7 +91,7 @@ class Fnf_chart:
 			notes_list.append([note[0], note[1] + keys_count, note[2]])  # we have to change the column number here
 
 		# 3. Sort the list by chronological order
-		notes_list.sort(key=lambda note: ' '.join(map(str, note[:3]))) # sort the notes by offset order (using the index 0) and ignore any argument, if argument count exceeds 3
+		notes_list.sort(key=lambda note: note[:3]) # sort the notes by offset order (using the index 0) and ignore any argument, if argument count exceeds 3
 		return notes_list
 
 	def exportOsuFile(self, path, diff_name, creator, tags):
@@ -79,166 +107,40 @@ class Fnf_chart:
 			Return:
 				Nothing, it's wrote on a .osu file
 		"""
+		with open(f"{path}/{self.getOsuFileName(diff_name, creator)}", "w", encoding="utf-8") as osu_file:
+			self.writeOsuFile(osu_file, diff_name, creator, tags)
 
-		# 0. Initialization
-
-		# function consts
-		audio_file_name = "audio.mp3"  # audio file name
-		background_file_name = "background.jpg"  # background file name
-		source = "Friday Night Funkin"
-		osu_file_name = removeIllegalCharacters(f"{self.artist} - {self.title} ({creator}) [{diff_name}].osu")
-		sample_set = 1  # the sampleset to use in the beatmap
-		sample_index = 0  # custom sample index for hitobjects
-
-		meter = self.osu_object.meter  # the meter to set for uninherited timing points
-		volume = 50  # volume/100 of the hitsounds
-
-		# variable settings
-		# artist
-		if self.artist == "" or self.artist == None:
-			artist = "Unknown"
-		else:
-			artist = self.artist
-		
-		# keys count
-		keys_count = self.getKeysCount()
-
-		# scroll speed
-		scroll_speed = self.getScrollSpeed()
-		
-		# osu file consts
-		# [General] data
-		general_data = {
-			"AudioFilename": audio_file_name,
-			"AudioLeadIn": 0,
-			"PreviewTime": -1,
-			"Countdown": 0,
-			"SampleSet": "None",
-			"StackLeniency": 0.7,
-			"Mode": 3,
-			"LetterboxInBreaks": 0,
-			"SpecialStyle": 0,
-			"WidescreenStoryboard": 0
-		}
-		# [Editor] data
-		editor_data = {
-			"DistanceSpacing": 1,
-			"BeatDivisor": 4,
-			"GridSize": 32,
-			"TimelineZoom": 1
-		}
-		# [Metadata] data
-		metadata_data = {
-			"Title": self.title,
-			"TitleUnicode": self.title,  # (same than Title)
-			"Artist": artist,
-			"ArtistUnicode": artist,  # (same than Artist)
-			"Creator": creator,  # (the username)
-			"Version": diff_name,
-			"Source": source,
-			"Tags": tags,
-			"BeatmapID": -1,
-			"BeatmapSetID": -1
-		}
-		# [Difficulty] data
-		difficulty_data = {
-			"HPDrainRate": 5,  # HP drain
-			"CircleSize": keys_count,  # amount of keys
-			"OverallDifficulty": 8,  # tried to reproduce the timing in fnf (300 = 40.5ms vs 40ms in FnF)
-			"ApproachRate": 6.9,  # this value is ignored in Mania
-			"SliderMultiplier": scroll_speed,
-			"SliderTickRate": 1
-		}
-
-		osu_file_content = "osu file format v14\n"  # we start to define the first line of the file
-		
-		# 1. Generate [General]/[Editor]/[Metadata]/[Difficulty]
-		osu_file_content += "\n[General]\n"
-		for k in general_data.keys():
-			osu_file_content += f"{k}:{general_data[k]}\n"
-		osu_file_content += "\n[Editor]\n"
-		for k in editor_data.keys():
-			osu_file_content += f"{k}:{editor_data[k]}\n"
-		osu_file_content += "\n[Metadata]\n"
-		for k in metadata_data.keys():
-			osu_file_content += f"{k}:{metadata_data[k]}\n"
-		osu_file_content += "\n[Difficulty]\n"
-		for k in difficulty_data.keys():
-			osu_file_content += f"{k}:{difficulty_data[k]}\n"
-
-		# 2. Generate [Events] : define the background & breaks periods
-		osu_file_content += "\n[Events]\n"
-
-		# background
-		osu_file_content += "//Background and Video events\n"
-		if self.osu_object.background_path != "":  # if defined background path
-			osu_file_content += f"0,0,\"{background_file_name}\",0,0\n"  # the background
-		# break periods
-		osu_file_content += "//Break Periods\n"
-		# ignored part :p
-		# storyboard (we don't care)
-		osu_file_content += "//Storyboard Layer 0 (Background)\n//Storyboard Layer 1 (Fail)\n//Storyboard Layer 2 (Pass)\n//Storyboard Layer 3 (Foreground)\n//Storyboard Layer 4 (Overlay)\n//Storyboard Sound Samples"
-
-		# 3. Generate the [TimingPoints] section
-		# bpm points
-		osu_file_content += "\n[TimingPoints]\n"
-		timing_points = self.optimizeBPMList(self.getBPMList())  # get all points
-		for i in range(len(timing_points)):
-			# red tick (bpm change)
-			osu_file_content += f"{int(timing_points[i][0])+self.offset},{bpmToMs(timing_points[i][1])},{meter},{sample_set},{sample_index},{volume},1,0\n"
-			# green tick (scroll speed change) (to keep the same scroll speed)
-			osu_file_content += f"{int(timing_points[i][0])+self.offset},{-100*(timing_points[i][1]/self.getBPM())},{meter},{sample_set},{sample_index},{volume},0,0\n"
-
-		# 4. Generate the [HitObjects] section, where they're the notes
-		osu_file_content += "\n[HitObjects]\n"
-
-		# get the list with all notes we want (details in the function doc)
-		# notes are stored in notes_list, which is a list of list with [offset, column, length]
-		if (self.map_mode % 10) == 1:  # player 1 only
-			notes_list = self.getNotesFromPlayer(1, keys_count)
-		elif (self.map_mode % 10) == 2:  # player 2 only
-			notes_list = self.getNotesFromPlayer(2, keys_count)
-		elif (self.map_mode % 10) == 3:  # players 1 and 2 at the same time
-			notes_list = self.getNotesFromPlayer(0, keys_count)
-		elif (self.map_mode % 10) == 4:  # co-op player_2 player_1
-			notes_left = self.getNotesFromPlayer(2, keys_count)
-			notes_right = self.getNotesFromPlayer(1, keys_count)
-			notes_list = self.concatenateCharts(notes_left, notes_right, int(keys_count/2))
-		elif (self.map_mode % 10) == 5:  # co-op player_1 player_2
-			notes_left = self.getNotesFromPlayer(1, keys_count)
-			notes_right = self.getNotesFromPlayer(2, keys_count)
-			notes_list = self.concatenateCharts(notes_left, notes_right, int(keys_count/2))
-		else:  # idk how it's possible to finish here
-			notes_list = []
-
-		# removes the overlaps
-		notes_list = self.removeOverlaps(notes_list, keys_count)
+		return  # nothing
 
-		# convert to osu notes
+	def formatHitObject(self, note, note_index, keys_count, sample_set, sample_index, volume):
+		"""
+			Class method:
+				Convert a note to a line of the [HitObjects] section of a .osu file.
+			Arguments:
+				note (list) : [offset (int), column (int), length (int)], from self.removeOverlaps().
+				note_index (int) : position of the note in the chart (the 1st note is the one with the index 0).
+				keys_count (int) : the amount of keys in the chart.
+				sample_set, sample_index, volume (int) : hitsounds settings.
+			Return:
+				str: the line (with '\n').
+		"""
 		note_type = 0  # used to determinate the 4th parameter of a hitobject. 1=normal note, 128=long note, +4=new combo
-			
-		for i in range(len(notes_list)):
-			if notes_list[i][2]==0:  # normal note
-				# calculate note_type
-				note_type = 1  # binary: 0000 0001
-				if i == 0:  # first note
-					note_type += 4  # add new combo (binary: 0000 0100)
-				# generate the note in the osu file
-				osu_file_content += f"{int(notes_list[i][1]/keys_count*528)},192,{notes_list[i][0]+self.offset},{note_type},0,{sample_set}:0:{sample_index}:{volume}:\n"
-
-			else:  # long/hold note
-				# calculate note_type
-				note_type = 128  # binary: 1000 0000
-				if i == 0:  # first note
-					note_type += 4  # add new combo (binary: 0000 0100)
-				# generate the note in the osu file
-				osu_file_content += f"{int(notes_list[i][1]/keys_count*528)},192,{notes_list[i][0]+self.offset},{note_type},0,{notes_list[i][0]+notes_list[i][2]+self.offset}:{sample_set}:0:{sample_index}:{volume}:\n"
-		
-		# 5. Create and write in the file
-		with open(f"{path}/{osu_file_name}", "w", encoding="utf-8") as osu_file:
-			osu_file.write(osu_file_content)
 
-		return  # nothing
+		if note[2]==0:  # normal note
+			# calculate note_type
+			note_type = 1  # binary: 0000 0001
+			if note_index == 0:  # first note
+				note_type += 4  # add new combo (binary: 0000 0100)
+			# generate the note in the osu file
+			return f"{int(note[1]/keys_count*528)},192,{note[0]+self.offset},{note_type},0,{sample_set}:0:{sample_index}:{volume}:\n"
+
+		else:  # long/hold note
+			# calculate note_type
+			note_type = 128  # binary: 1000 0000
+			if note_index == 0:  # first note
+				note_type += 4  # add new combo (binary: 0000 0100)
+			# generate the note in the osu file
+			return f"{int(note[1]/keys_count*528)},192,{note[0]+self.offset},{note_type},0,{note[0]+note[2]+self.offset}:{sample_set}:0:{sample_index}:{volume}:\n"
 
 	def getBPM(self):
 		"""
@@ -252,7 +154,7 @@ class Fnf_chart:
 				int or float: BPM of the song.
 		"""
 		if self.custom_bpm == 0:
-			json_data = json.loads(jsonRemoveExtraData(self.map_path))  # parse the file as dict
+			json_data = self.getChartData()  # parse the file as dict
 			try:  # search in "bpm" section first
 				return json_data["bpm"]
 			except: # search in "bpm" but into "song" section
@@ -266,26 +168,54 @@ class Fnf_chart:
 	def getBPMList(self):
 		"""
 			Class method:
-				Returns a list with all BPM changes.
+				Returns a list with all BPM changes, sorted by offset.
+				The sections are read once, like the Conductor of FnF: the song starts at 0 ms with the song BPM, and each section lasts its amount of steps (see getSectionSteps())
+				at the BPM in effect. A section with changeBPM (and a valid bpm) changes the BPM where it starts, even if it doesn't have any note.
+				If self.custom_bpm is defined, there's only 1 BPM point, on the 1st note.
 			Arguments:
 				None.
 			Return:
 				List of lists with 2 elements [offset, BPM_value].
 		"""
-		bpm_list = []  # all bpm change points
-		if self.custom_bpm == 0:  # if this value isn't defined
-			json_data = json.loads(jsonRemoveExtraData(self.map_path))  # parse the file as dict
-			for i in range(len(json_data["song"]["notes"])):
-				element = json_data["song"]["notes"][i]  # this is a dict
-				if "bpm" in element.keys() and element["sectionNotes"]!=[]:  # if BPM property defined and if notes exists
-						bpm_list.append([element["sectionNotes"][0][0], element["bpm"]])
-			
-		# if the still empty (custom bpm defined or no timing points found: we suppose there is only 1 BPM change)
-		if bpm_list == []:
-			bpm_list = [[self.getNotesFromPlayer(0, 99)[0][0], self.getBPM()]]
+		if self.custom_bpm != 0:  # only 1 BPM for the whole song
+			return [[self.getNotesFromPlayer(0, 99)[0][0], self.getBPM()]]
+
+		json_data = self.getChartData()  # parse the file as dict
+		song_bpm = self.getBPM()
+		bpm = song_bpm if type(song_bpm) in [int, float] and song_bpm > 0 else self.default_bpm  # the BPM in effect
+		bpm_list = [[0, song_bpm]]  # all bpm change points
+		change_time = 0  # when the BPM in effect started, in ms
+		change_steps = 0  # when the BPM in effect started, in steps
+		steps = 0  # start of the current section, in steps
+
+		for section in json_data["song"]["notes"]:
+			section_bpm = section.get("bpm")
+			if section.get("changeBPM") == True and type(section_bpm) in [int, float] and section_bpm > 0 and section_bpm != bpm:
+				# the start of the section is computed from the last BPM change (and not section by section), so the rounding errors don't add up
+				change_time += (steps - change_steps) * bpmToMs(bpm) / 4  # 4 steps per beat
+				change_steps = steps
+				bpm = section_bpm
+				if bpm_list[-1][0] == round(change_time, 3):  # 2 BPM at the same time: only the last one is used
+					bpm_list[-1][1] = bpm
+				else:
+					bpm_list.append([round(change_time, 3), bpm])
+			steps += getSectionSteps(section)
 
 		return bpm_list
 
+	def getChartData(self):
+		"""
+			Class method:
+				Returns the parsed JSON file of the chart.
+				The file is parsed only once and shared with every Fnf_chart using the same file (see loadChartData()).
+				The returned dict must not be modified.
+			Arguments:
+				None.
+			Return:
+				dict: the content of the JSON file.
+		"""
+		return loadChartData(self.map_path)
+
 	def getKeysCount(self):
 		"""
 			Class method:
@@ -318,51 +248,86 @@ class Fnf_chart:
 		assert player_id in [0,1,2]
 		assert keys_count > 0
 
-		# parse the file as a dictionary
-		json_data = json.loads(jsonRemoveExtraData(self.map_path))
+		# the notes of the file, already cleaned (see sanitizeChartNotes()), shared by all calls
+		sanitized_sections = self.getSanitizedNotes()
 
 		# the list we want (list of [note_start_time (0), column (1), note_length (2)])
 		notes_list = []
+		cancel_token = self.cancel_token
 		
-		for section in json_data["song"]["notes"]:  # for each section...
+		for section, section_notes, has_errors in sanitized_sections:  # for each section...
+			if cancel_token != None:
+				cancel_token.check()
 			# check if the section is from the player we're looking at (if we're looking at all players it will be always false)
 			is_player_section = (player_id != 0) and (player_id == 1 and section["mustHitSection"] == True) or (player_id == 2 and section["mustHitSection"] == False)
 
-			for i in range(len(section["sectionNotes"])):  # for each note in the section
-				# get the note
-				note = section["sectionNotes"][i]
-				# Clean the note to remove extra arguments that cause crashes. Remove non-numbers arguments
-				j = 0
-				while j < len(note):
-					if not is_a_float(note[j]):
-						del note[j]
-					else:
-						j += 1
-				
-				note = note[0:3]  # only keep the 3 first elemnts of the list
-				note[1] = int(note[1])  # force int conversion for the key number
+			if not(has_errors):  # fast path: only valid notes, selected by their column
+				if is_player_section:  # the section is for the player, then get only columns 0 to keys_count-1
+					notes_list += [[offset, column, length] for offset, column, length in section_notes if column < keys_count]
+				elif player_id == 0:  # we want all notes regardless of the player
+					notes_list += [[offset, column % keys_count, length] for offset, column, length in section_notes]
+				else:  # the section isn't for the player, exclude columns 0 to keys_count-1
+					notes_list += [[offset, column % keys_count, length] for offset, column, length in section_notes if column >= keys_count]
+				continue
+
+			# slow path: the errors are raised only when the note which causes them is reached, like before the cleaning
+			for note in section_notes:
+				if isinstance(note, Exception):  # this note (or the section) can't be read at all
+					raise note
+				offset, column, length = note
 
-  				# If we have less than 3 arguments or the argument [1] (key number isn't valid) the note is ignored
-				if len(note) < 3 or (not is_a_int(note[1])) or note[1] < 0:
-					continue
-				
 				# Add the note on the list if it's for the player
-				if is_player_section and note[1] < keys_count:  # the section is for the player, then get only columns 0 to keys_count-1
-					note[0] = int(note[0])
-					note[2] = int(note[2]) if (int(note[2]) >= 0) else 0  # round and set 0 if the length is negative
-					notes_list.append(note)
-				elif not is_player_section and ((player_id == 0) or (note[1] >= keys_count)):  # the section isn't for the player, exclude columns 0 to keys_count-1 OR we want all notes regardless of the player
-					note[0] = int(note[0])
-					note[1] %= keys_count  # apply modulo keys_count
-					note[2] = int(note[2]) if (int(note[2]) >= 0) else 0  # round and set 0 if the length is negative
-					notes_list.append(note)
+				if (is_player_section and column < keys_count) or (not is_player_section and ((player_id == 0) or (column >= keys_count))):
+					if isinstance(offset, Exception):
+						raise offset
+					if isinstance(length, Exception):
+						raise length
+					notes_list.append([offset, column if is_player_section else column % keys_count, length])
 
 		# notes_list.sort(key=lambda note: ' '.join(map(str, note[:3]))) # sort the notes by offset order (using the index 0) and ignore any argument, if argument count exceeds 3
 		# ^removed as it may geenrate memory leaks and fill your RAM wtf (on Linux with kubuntu 23.10)
 		notes_list.sort(key=lambda x: x[0])  # sort the notes by offset order
 		
 		return notes_list
-		
+
+	def getOsuFileContent(self, diff_name, creator, tags):
+		"""
+			Class method:
+				Same than exportOsuFile(), but returns the content of the .osu file instead of creating the file.
+			Arguments:
+				diff_name (str) : the difficulty name to generate. (Normal, Hard, ...)
+				creator (str) : map creator.
+				tags (str) : map tags.
+			Return:
+				str: the content of the .osu file.
+		"""
+		osu_file = io.StringIO()
+		self.writeOsuFile(osu_file, diff_name, creator, tags)
+		return osu_file.getvalue()
+
+	def getOsuFileName(self, diff_name, creator):
+		"""
+			Class method:
+				Returns the name of the .osu file generated by exportOsuFile().
+			Arguments:
+				diff_name (str) : the difficulty name. (Normal, Hard, ...)
+				creator (str) : map creator.
+			Return:
+				str: the file name, without illegal characters.
+		"""
+		return removeIllegalCharacters(f"{self.artist} - {self.title} ({creator}) [{diff_name}].osu")
+
+	def getSanitizedNotes(self):
+		"""
+			Class method:
+				Returns the notes of the chart, cleaned only once and shared with every Fnf_chart using the same file (see loadSanitizedNotes()).
+			Arguments:
+				None.
+			Return:
+				list: see sanitizeChartNotes().
+		"""
+		return loadSanitizedNotes(self.map_path)
+
 	def getScrollSpeed(self):
 		"""
 			Class method:
@@ -372,9 +337,30 @@ class Fnf_chart:
 			Return:
 				float: Scroll speed value.
 		"""
-		json_data = json.loads(jsonRemoveExtraData(self.map_path))  # parse the file as dict
+		json_data = self.getChartData()  # parse the file as dict
 		return json_data["song"]["speed"]
 
+	def getTimingIndex(self):
+		"""
+			Class method:
+				Returns the timing points of the chart (from getBPMList() and optimizeBPMList()) as a Timing_index.
+				It's built only once and shared with every Fnf_chart using the same file and the same custom BPM, as long as the chart in chart_cache is the same.
+			Arguments:
+				None.
+			Return:
+				Timing_index: the timing points. It's shared, so it must not be modified.
+		"""
+		json_data = self.getChartData()
+		cache_key = (os.path.abspath(self.map_path), self.custom_bpm)
+
+		cached_index = timing_index_cache.get(cache_key)
+		if cached_index != None and cached_index[0] is json_data:  # the chart hasn't been parsed again since
+			return cached_index[1]
+
+		timing_index = Timing_index(self.optimizeBPMList(self.getBPMList()), self.getBPM())
+		timing_index_cache[cache_key] = (json_data, timing_index)
+		return timing_index
+
 	def optimizeBPMList(self, bpm_list):
 		"""
 			Class method:
@@ -393,8 +379,9 @@ class Fnf_chart:
 		# 1. Replace the BPM = 0 by the value we get using getBPM()
 		# yes, you can have BPM = 0...
 
-		if self.getBPM()>=0:
-			default_bpm = self.getBPM()
+		song_bpm = self.getBPM()
+		if song_bpm>=0:
+			default_bpm = song_bpm
 		else:
 			default_bpm = self.default_bpm
 
@@ -429,6 +416,7 @@ class Fnf_chart:
 				keys_count: the amount of key in the chart. All columns out of the range of keys_count will be lost.
 			Returns:
 				A new list of notes in the format [offset (int), column (int), length (int)]
+				The list is sorted by ascending offset.
 		"""
 
 		final_notes = []  # output
@@ -444,37 +432,29 @@ class Fnf_chart:
 
 		# remove the overlaps
 		for notes_column in notes_list_c:  # for each column
+			if self.cancel_token != None:
+				self.cancel_token.check()
 
-			if len(notes_column) <= 0:  # the column is empty
-			
-				notes_list_c.append([])  # add an empty column
-			
-			else:  # the column isn't empty
+			if len(notes_column) > 0:  # ignore the empty columns
 				# gets the "points" columns
-				points = []  # a list of list with [time (int), type (int)] with time in ms and type: 1 = clickable (simple note or start of a long note) and 0 = the end of a long note
+				points = []  # a list of tuples (time (int), type (int)) with time in ms and type: 1 = clickable (simple note or start of a long note) and 0 = the end of a long note
 				for note in notes_column:
-					if note[2] == 0:  # simple note
-						points.append([note[0], 1])
-					else:  # long note
-						points.append([note[0], 1])
-						points.append([note[0] + note[2], 0])
-				points.sort(key=lambda x: x[0])  # sort by time order
+					points.append((note[0], 1))
+					if note[2] != 0:  # long note
+						points.append((note[0] + note[2], 0))
+				points.sort()  # sort by time order (only 1 sort per column)
 
 				# remove the duplicate points to have only one at the time (points type = 1 have priority over type = 0)
-				i = 0
-				while i < len(points):
-					# we reached the last element
-					if (i + 1) >= len(points):  # index i+1 doesn't exists
-						i += 1  # it will make exit the while loop
-					else:
-						if abs(points[i][0] - points[i+1][0]) < 2:  # overlap (margin of less than 2 ms because idk I get weird rounding issues)
-							if (points[i][1] == 0) and (points[i+1][1] == 1):  # the only situation where we remove the point at index i
-								del(points[i])
-							else:  # remove the point at index i+1
-								del(points[i+1])
-						else:  # no overlap
-							i += 1
-
+				# each point is compared with the last kept point, so the whole column is read only 1 time
+				kept_points = []
+				for point in points:
+					if len(kept_points) > 0 and abs(kept_points[-1][0] - point[0]) < 2:  # overlap (margin of less than 2 ms because idk I get weird rounding issues)
+						if (kept_points[-1][1] == 0) and (point[1] == 1):  # the only situation where we replace the last kept point
+							kept_points[-1] = point
+						# else the new point is removed
+					else:  # no overlap
+						kept_points.append(point)
+				points = kept_points
 
 				# Build the note
 				column_number = notes_column[0][1]  # is the same for every notes in notes_column
@@ -495,96 +475,286 @@ class Fnf_chart:
 		final_notes.sort(key=lambda x: x[0])
 
 		return final_notes
-		
-			
-class Osu_map:
-	"""
-		Object:
-			Represents an osu! beatmapset
-		Arguments:
-			title (str) : song title.
-			artist (str) : song artist.
-			creator (str) : map creator. In other words, the osu! username of the guy who uses this program.
-			tags (str) : map tags.
-			background_path (str) : path to the background to put. Empty = no background added
-			audio1_path (str) : path to audio 1 file.
-		Optional arguments :
-			audio2_path (str) : path to audio 2 file (useful since FnF usually uses 2 files for the song).
-			audio1_volume (int 0-100) : volume in percent of the audio 1. 100% by default.
-			custom_bpm (float) : if not equal to 0, will define the BPM of the whole song only 1 time.
-			meter (int) : meter of the song n/4 (ex: 4 as value -> meter 4/4)
-			offset (int) : move the notes by this value in ms. 0 by default.
-	"""
-
-	def __init__(self, title, artist, creator, tags, audio1_path, audio2_path="", audio1_volume=100, audio2_volume=100, background_path="", custom_bpm=0, meter=4, offset=0):
-		# inputs
-		self.title = title  # song title
-		self.artist = artist  # song artist
-		self.creator = creator  # the beatmap's creator
-		self.tags = tags  # the tags of the beatmap
-		self.audio1_path = audio1_path  # path to the 1st ogg file
-		self.audio2_path = audio2_path  # path to the 2nd ogg file
-		self.audio1_volume = audio1_volume  # volume/100 of the 1st audio file
-		self.audio2_volume = audio2_volume  # volume/100 of the 2nd audio file (at least 1 of them should be 100)
-		self.background_path = background_path  # path to the background
-		self.custom_bpm = custom_bpm  # if not null, defines the bpm. Recommanded of the bpm is the same during the whole song
-		self.meter = meter  # n/4 where n is the value
-		self.offset = offset  # moves the notes (in ms)
-
-		# generated properties
-		self.fnf_charts = {}  # dict of Fnf objects (1 for each difficulty) {"diff_name": Fnf_chart object}
 
-	def addDifficulty(self, diff_name, map_mode, Fnf_chart_path):
+	def writeOsuFile(self, osu_file, diff_name, creator, tags):
 		"""
 			Class method:
-				Add a difficulty to convert for the beatmapset.
-				If you put a diff name that already exists, it will be replaced by the new one.
+				Write the content of a .osu file, section by section, into an opened text file.
 			Arguments:
-				diff_name (str) : the difficulty name (osu! difficulty).
-				map_mode (1-2-3-8-9) : type of map (see mode arg. from convertToOsuFile())
-				Fnf_chart_path (str) : path to the fnf JSON file.
-			Return:
-				Nothing.
-		"""
-		new_difficulty = Fnf_chart(Fnf_chart_path, self.audio1_path, self.audio2_path, self, map_mode)
-		self.fnf_charts.update({diff_name: new_difficulty})  # add this difficulty to the list
+				osu_file (text file object) : where to write. Can be an opened file or a io.StringIO.
+				diff_name (str) : the difficulty name to generate. (Normal, Hard, ...)
+				creator (str) : map creator. In other words, the osu! username of the guy who uses this program.
+				tags (str) : map tags.
 
-	def removeDifficulty(self, diff_name):
-		"""
-			Class method:
-				Remove a difficulty to convert for the beatmapset.
-				Do nothing if the difficulty doesn't exists.
-			Arguments:
-				diff_name (str) : the difficulty name (osu! difficulty) to remove.
 			Return:
-				Nothing.
+				Nothing, it's wrote on osu_file
 		"""
-		if diff_name in self.fnf_charts.keys():  # verify if the difficulty exists
-			self.fnf_charts.pop(diff_name)
 
-class Osz_converter:
-	"""
-		Class:
-			Represents the converter itself. This class does the export.
-		Arguments:
-			(optional) exporting_window (Exporting_window): a window made to trace the exporting status. If undefined, the status will be displayed on the console.
-	"""
+		# 0. Initialization
 
-	def __init__(self, exporting_window=None):
-		self.exporting_window = exporting_window
+		# function consts
+		audio_file_name = "audio.mp3"  # audio file name
+		background_file_name = "background.jpg"  # background file name
+		source = "Friday Night Funkin"
+		hit_objects_batch_size = 4096  # amount of notes formatted and written at once
+		sample_set = 1  # the sampleset to use in the beatmap
+		sample_index = 0  # custom sample index for hitobjects
 
-		# these 4 attributes are edited automatically
-		self.folder_name = ""  # the name of the last folder created. Set in exportAsOsz(). (ex: "sock.clip - Ballistic")
-		self.folder_path = ""  # the path to the folder created during the export. Includes the folder name. (ex: "C:/Downloads/random_folder/sock.clip - Ballistic")
-		self.osz_name = ""  # the name of the last .osz created. (ex: "sock.clip - Ballistic.osz")
-		self.osz_path = ""  # the path to the last .osz file created. Includes the file name. (ex: "C:/Downloads/random_folder/sock.clip - Ballistic.osz")
-		
-		self.__export_current_step = 0  # current step of the export
-		self.__export_total_steps = 0  # total amount of steps of the export
+		meter = self.osu_object.meter  # the meter to set for uninherited timing points
+		volume = 50  # volume/100 of the hitsounds
 
-	def deleteGeneratedFiles(self):
-		"""
-			Class method:
+		# variable settings
+		# artist
+		if self.artist == "" or self.artist == None:
+			artist = "Unknown"
+		else:
+			artist = self.artist
+		
+		# keys count
+		keys_count = self.getKeysCount()
+
+		# scroll speed
+		scroll_speed = self.getScrollSpeed()
+		
+		# osu file consts
+		# [General] data
+		general_data = {
+			"AudioFilename": audio_file_name,
+			"AudioLeadIn": 0,
+			"PreviewTime": -1,
+			"Countdown": 0,
+			"SampleSet": "None",
+			"StackLeniency": 0.7,
+			"Mode": 3,
+			"LetterboxInBreaks": 0,
+			"SpecialStyle": 0,
+			"WidescreenStoryboard": 0
+		}
+		# [Editor] data
+		editor_data = {
+			"DistanceSpacing": 1,
+			"BeatDivisor": 4,
+			"GridSize": 32,
+			"TimelineZoom": 1
+		}
+		# [Metadata] data
+		metadata_data = {
+			"Title": self.title,
+			"TitleUnicode": self.title,  # (same than Title)
+			"Artist": artist,
+			"ArtistUnicode": artist,  # (same than Artist)
+			"Creator": creator,  # (the username)
+			"Version": diff_name,
+			"Source": source,
+			"Tags": tags,
+			"BeatmapID": -1,
+			"BeatmapSetID": -1
+		}
+		# [Difficulty] data
+		difficulty_data = {
+			"HPDrainRate": 5,  # HP drain
+			"CircleSize": keys_count,  # amount of keys
+			"OverallDifficulty": 8,  # tried to reproduce the timing in fnf (300 = 40.5ms vs 40ms in FnF)
+			"ApproachRate": 6.9,  # this value is ignored in Mania
+			"SliderMultiplier": scroll_speed,
+			"SliderTickRate": 1
+		}
+
+		osu_file.write("osu file format v14\n")  # we start to define the first line of the file
+		
+		# 1. Generate [General]/[Editor]/[Metadata]/[Difficulty]
+		writeOsuSection(osu_file, "General", general_data)
+		writeOsuSection(osu_file, "Editor", editor_data)
+		writeOsuSection(osu_file, "Metadata", metadata_data)
+		writeOsuSection(osu_file, "Difficulty", difficulty_data)
+
+		# 2. Generate [Events] : define the background & breaks periods
+		osu_file.write("\n[Events]\n")
+
+		# background
+		osu_file.write("//Background and Video events\n")
+		if self.osu_object.background_path != "":  # if defined background path
+			osu_file.write(f"0,0,\"{background_file_name}\",0,0\n")  # the background
+		# break periods
+		osu_file.write("//Break Periods\n")
+		# ignored part :p
+		# storyboard (we don't care)
+		osu_file.write("//Storyboard Layer 0 (Background)\n//Storyboard Layer 1 (Fail)\n//Storyboard Layer 2 (Pass)\n//Storyboard Layer 3 (Foreground)\n//Storyboard Layer 4 (Overlay)\n//Storyboard Sound Samples")
+
+		# 3. Generate the [TimingPoints] section
+		# bpm points
+		osu_file.write("\n[TimingPoints]\n")
+		# red ticks (bpm changes) and green ticks (scroll speed changes, to keep the same scroll speed)
+		osu_file.write(self.getTimingIndex().getOsuTimingLines(self.offset, meter, sample_set, sample_index, volume))
+
+		# 4. Generate the [HitObjects] section, where they're the notes
+		osu_file.write("\n[HitObjects]\n")
+
+		# get the list with all notes we want (details in the function doc)
+		# notes are stored in notes_list, which is a list of list with [offset, column, length]
+		if (self.map_mode % 10) == 1:  # player 1 only
+			notes_list = self.getNotesFromPlayer(1, keys_count)
+		elif (self.map_mode % 10) == 2:  # player 2 only
+			notes_list = self.getNotesFromPlayer(2, keys_count)
+		elif (self.map_mode % 10) == 3:  # players 1 and 2 at the same time
+			notes_list = self.getNotesFromPlayer(0, keys_count)
+		elif (self.map_mode % 10) == 4:  # co-op player_2 player_1
+			notes_left = self.getNotesFromPlayer(2, keys_count)
+			notes_right = self.getNotesFromPlayer(1, keys_count)
+			notes_list = self.concatenateCharts(notes_left, notes_right, int(keys_count/2))
+		elif (self.map_mode % 10) == 5:  # co-op player_1 player_2
+			notes_left = self.getNotesFromPlayer(1, keys_count)
+			notes_right = self.getNotesFromPlayer(2, keys_count)
+			notes_list = self.concatenateCharts(notes_left, notes_right, int(keys_count/2))
+		else:  # idk how it's possible to finish here
+			notes_list = []
+
+		# removes the overlaps
+		notes_list = self.removeOverlaps(notes_list, keys_count)
+
+		# convert to osu notes, and write them by batches
+		for batch_start in range(0, len(notes_list), hit_objects_batch_size):
+			if self.cancel_token != None:
+				self.cancel_token.check()
+			batch = notes_list[batch_start:batch_start+hit_objects_batch_size]
+			osu_file.write("".join(self.formatHitObject(note, batch_start+i, keys_count, sample_set, sample_index, volume) for i, note in enumerate(batch)))
+
+		return  # nothing
+		
+			
+class Osu_map:
+	"""
+		Object:
+			Represents an osu! beatmapset
+		Arguments:
+			title (str) : song title.
+			artist (str) : song artist.
+			creator (str) : map creator. In other words, the osu! username of the guy who uses this program.
+			tags (str) : map tags.
+			background_path (str) : path to the background to put. Empty = no background added
+			audio1_path (str) : path to audio 1 file.
+		Optional arguments :
+			audio2_path (str) : path to audio 2 file (useful since FnF usually uses 2 files for the song).
+			audio1_volume (int 0-100) : volume in percent of the audio 1. 100% by default.
+			custom_bpm (float) : if not equal to 0, will define the BPM of the whole song only 1 time.
+			meter (int) : meter of the song n/4 (ex: 4 as value -> meter 4/4)
+			offset (int) : move the notes by this value in ms. 0 by default.
+	"""
+
+	def __init__(self, title, artist, creator, tags, audio1_path, audio2_path="", audio1_volume=100, audio2_volume=100, background_path="", custom_bpm=0, meter=4, offset=0):
+		# inputs
+		self.title = title  # song title
+		self.artist = artist  # song artist
+		self.creator = creator  # the beatmap's creator
+		self.tags = tags  # the tags of the beatmap
+		self.audio1_path = audio1_path  # path to the 1st ogg file
+		self.audio2_path = audio2_path  # path to the 2nd ogg file
+		self.audio1_volume = audio1_volume  # volume/100 of the 1st audio file
+		self.audio2_volume = audio2_volume  # volume/100 of the 2nd audio file (at least 1 of them should be 100)
+		self.background_path = background_path  # path to the background
+		self.custom_bpm = custom_bpm  # if not null, defines the bpm. Recommanded of the bpm is the same during the whole song
+		self.meter = meter  # n/4 where n is the value
+		self.offset = offset  # moves the notes (in ms)
+
+		# generated properties
+		self.fnf_charts = {}  # dict of Fnf objects (1 for each difficulty) {"diff_name": Fnf_chart object}
+
+	def addDifficulty(self, diff_name, map_mode, Fnf_chart_path):
+		"""
+			Class method:
+				Add a difficulty to convert for the beatmapset.
+				If you put a diff name that already exists, it will be replaced by the new one.
+			Arguments:
+				diff_name (str) : the difficulty name (osu! difficulty).
+				map_mode (1-2-3-8-9) : type of map (see mode arg. from convertToOsuFile())
+				Fnf_chart_path (str) : path to the fnf JSON file.
+			Return:
+				Nothing.
+		"""
+		new_difficulty = Fnf_chart(Fnf_chart_path, self.audio1_path, self.audio2_path, self, map_mode)
+		self.fnf_charts.update({diff_name: new_difficulty})  # add this difficulty to the list
+
+	def removeDifficulty(self, diff_name):
+		"""
+			Class method:
+				Remove a difficulty to convert for the beatmapset.
+				Do nothing if the difficulty doesn't exists.
+			Arguments:
+				diff_name (str) : the difficulty name (osu! difficulty) to remove.
+			Return:
+				Nothing.
+		"""
+		if diff_name in self.fnf_charts.keys():  # verify if the difficulty exists
+			self.fnf_charts.pop(diff_name)
+
+class Osz_converter:
+	"""
+		Class:
+			Represents the converter itself. This class does the export.
+		Arguments:
+			(optional) exporting_window (Exporting_window): a window made to trace the exporting status. If undefined, the status will be displayed on the console.
+			(optional) workers (int): maximum amount of processes used to create the .osu files at the same time. 1 (default) = no additional process ; 0 = 1 process per CPU core.
+				Each process parses the charts again and starting them costs more than creating the .osu files of usual charts, so only huge mapsets should use more than 1.
+			(optional) audio_cache (Audio_cache): where to reuse the audio.mp3 from previous exports. If undefined, the audio is always generated.
+			(optional) direct_archive (bool): if True (default), the files are written directly into the .osz. If False, they're written in a folder which is compressed at the end.
+			(optional) progress_callback (function): if defined and if there isn't any exporting_window, called with (current step (int), total steps (int), status (str)) instead of displaying the status on the console.
+			(optional) show_crash_window (bool): if True (default), an error during the export opens a Crash_window. If False, the error is raised (useful without GUI).
+			(optional) trace_memory (bool): if True, the memory allocated by each step is measured with tracemalloc (slower). False by default.
+			(optional) timings_format (str): if "json" or "chrome", the time and memory used by each step are written next to the .osz (see writeStageTimings()). "" (default) = no file.
+			(optional) profile (bool): if True, each export is profiled and the results are written next to the .osz (see Export_profiler). False by default.
+			(optional) audio_backend (str): how the audio.mp3 is created, see exportAudio(). "ffmpeg" (default), "stream" or "pydub".
+			(optional) incremental (bool): if True, only the files whose inputs changed since the last export of the mapset are generated again (see exportIncrementalArchive()). False by default.
+			(optional) app_version (str): the version of the application, so an incremental export never reuses the .osu files of another version (see getConverterHash()). "" by default.
+		The export can be stopped from another thread with cancel().
+	"""
+
+	def __init__(self, exporting_window=None, workers=1, audio_cache=None, direct_archive=True, progress_callback=None, show_crash_window=True, trace_memory=False, timings_format="", profile=False, audio_backend="ffmpeg", incremental=False, app_version=""):
+		assert audio_backend in audio_backends
+
+		self.exporting_window = exporting_window
+		self.workers = workers
+		self.audio_cache = audio_cache
+		self.direct_archive = direct_archive
+		self.progress_callback = progress_callback
+		self.show_crash_window = show_crash_window
+		self.timings_format = timings_format
+		self.profile = profile
+		self.audio_backend = audio_backend
+		self.incremental = incremental
+		self.app_version = app_version
+		self.stage_timer = Stage_timer(trace_memory)  # measures each step of the export (see getStageTimings())
+		self.cancel_token = Cancel_token()  # checked at each step of the export, see cancel()
+		self.audio_bitrate = "192k"  # bitrate of the generated audio.mp3
+
+		# these 6 attributes are edited automatically
+		self.folder_name = ""  # the name of the last folder created. Set in exportAsOsz(). (ex: "sock.clip - Ballistic")
+		self.folder_path = ""  # the path to the folder created during the export. Includes the folder name. (ex: "C:/Downloads/random_folder/sock.clip - Ballistic"). Stays empty with direct_archive.
+		self.temp_audio_path = ""  # with direct_archive, the temporary audio.mp3 to put in the .osz.
+		self.temp_osz_path = ""  # the .osz being written by writeOsz(). It's renamed to self.osz_path once it's complete.
+		self.osz_name = ""  # the name of the last .osz created. (ex: "sock.clip - Ballistic.osz")
+		self.osz_path = ""  # the path to the last .osz file created. Includes the file name. (ex: "C:/Downloads/random_folder/sock.clip - Ballistic.osz")
+		
+		self.__export_current_step = 0  # current step of the export
+		self.__export_total_steps = 0  # total amount of steps of the export
+		self.__status_lock = threading.Lock()  # status() is called by the audio and the charts branches at the same time
+
+	def cancel(self):
+		"""
+			Class method:
+				Stop the export in progress (called from another thread, for example by the Cancel button).
+				The export stops at its next step or in the loop in progress, and the running ffmpeg is terminated.
+				The difficulties already generated in other processes are finished first.
+				exportAsOsz() then returns without error, deleteGeneratedFiles() can be called once its thread is finished.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		self.cancel_token.cancel()
+
+	def deleteGeneratedFiles(self):
+		"""
+			Class method:
 				Delete (or at least try) to delete the folder and the .osz generated during the conversion.
 			Arguments:
 				None.
@@ -592,11 +762,26 @@ class Osz_converter:
 				Nothing.
 		"""
 		# folder
+		if self.folder_path != "":  # not created with direct_archive
+			try:
+				shutil.rmtree(self.folder_path)
+			except:
+				print(f"WARNING: error while trying to delete the generated folder ('{self.folder_path}')")
+				# idk why, but is the song title is empty, the folder will not be deleted
+
+		# temporary audio
+		try:
+			if self.temp_audio_path != "" and fileExists(self.temp_audio_path):
+				os.remove(self.temp_audio_path)
+		except:
+			print(f"WARNING: error while trying to delete the temporary audio ('{self.temp_audio_path}')")
+
+		# unfinished .osz
 		try:
-			shutil.rmtree(self.folder_path)
+			if self.temp_osz_path != "" and fileExists(self.temp_osz_path):
+				os.remove(self.temp_osz_path)
 		except:
-			print(f"WARNING: error while trying to delete the generated folder ('{self.folder_path}')")
-			# idk why, but is the song title is empty, the folder will not be deleted
+			print(f"WARNING: error while trying to delete the unfinished .osz ('{self.temp_osz_path}')")
 
 		# .osz
 		try:
@@ -605,6 +790,20 @@ class Osz_converter:
 		except:
 			print(f"WARNING: error while trying to delete the generated .osz ('{self.osz_path}')")
 
+	def encodeMp3(self, audio, audio_path):
+		"""
+			Class method:
+				Encode an AudioSegment as mp3 with ffmpeg, like AudioSegment.export(), but the ffmpeg process is terminated if the export is cancelled.
+			Arguments:
+				audio (AudioSegment): the audio to encode.
+				audio_path (str): where to create the mp3.
+			Returns:
+				Nothing.
+		"""
+		wav_data = io.BytesIO()
+		audio.export(wav_data, format="wav")  # the wav is written by pydub itself, without ffmpeg
+		self.runFfmpeg([audio.converter, "-y", "-hide_banner", "-loglevel", "error", "-f", "wav", "-i", "pipe:0", "-b:a", self.audio_bitrate, "-f", "mp3", audio_path], wav_data.getvalue())
+
 	def exportAsOsz(self, osu_map, path):
 		"""
 			Class method:
@@ -616,102 +815,678 @@ class Osz_converter:
 			Returns:
 				Nothing.
 		"""
+		profiler = Export_profiler() if self.profile else None
 		try:
+			if profiler != None:
+				profiler.start()
+
 			# 0. Initialization...
 			self.__export_current_step = -1
 			self.__export_total_steps = 0
+			self.stage_timer.reset()
+			self.cancel_token.reset()
+			for fnf_chart in osu_map.fnf_charts.values():  # the long loops of the charts also check if the export is cancelled
+				fnf_chart.cancel_token = self.cancel_token
 			self.status("Initialization...")
 			self.folder_name = ""
+			self.folder_path = ""
+			self.temp_audio_path = ""
+			self.temp_osz_path = ""
 			self.osz_name = ""
-			# get total amount of steps
-			self.__export_total_steps = 4 + len(osu_map.fnf_charts.keys())  # steps 1,5,6,7 + step 4
-			if osu_map.audio2_path == "":  # step 2
-				self.__export_total_steps += 2  # only audio 1
+			self.osz_path = ""
+			# look for the audio in the cache (with incremental, the audio files are read only once: their hash is also used by the manifest)
+			audio_hashes = self.getAudioHashes(osu_map) if self.incremental else None
+			audio_cache_key = self.getAudioCacheKey(osu_map, audio_hashes)
+			if audio_cache_key != None:
+				cached_audio_path = self.audio_cache.getFile(audio_cache_key)
 			else:
-				self.__export_total_steps += 4  # audio 1 & 2
+				cached_audio_path = None
+			# get total amount of steps (with incremental, it's known once the changes are found)
+			if self.direct_archive:
+				self.__export_total_steps = 3 + len(osu_map.fnf_charts.keys())  # steps 1,5,7 + step 4
+			else:
+				self.__export_total_steps = 4 + len(osu_map.fnf_charts.keys())  # steps 1,5,6,7 + step 4
+			self.__export_total_steps += self.getAudioStepsCount(osu_map, cached_audio_path)  # step 2
 			if osu_map.background_path != "":
 				self.__export_total_steps += 1  # includes background
 
-			# 1. create the folder with all files to compress
-			self.status("Creating the folder...")
-
-			# artist
-			if osu_map.artist == "" or osu_map.artist == None:
-				artist = "Unknown"
-			else:
-				artist = osu_map.artist
 			# define the folder name
-			self.folder_name = removeIllegalCharacters(f"{artist} - {osu_map.title}")  # the folder file name
-			# get the full path of the folder
-			if path != "":  # if custom path defined
-				self.folder_path = f"{path}/{self.folder_name}"
+			self.folder_name = self.getFolderName(osu_map)  # the folder file name (also used for the .osz)
+
+			# 1. to 6. create the .osz
+			if self.incremental:
+				self.exportIncrementalArchive(osu_map, path, audio_cache_key, cached_audio_path, audio_hashes)
+			elif self.direct_archive:
+				self.exportDirectArchive(osu_map, path, audio_cache_key, cached_audio_path)
 			else:
-				self.folder_path = self.folder_name  # attribute useful if the folder has to be removed (should be set BEFORE creating the folder)
-			# create the folder
-			os.makedirs(self.folder_path, exist_ok=True)  # disable errors if the folder already exists
-
-			print(self.folder_path)
-
-			# 2. create the audio.mp3
-			self.status("Importing audio file 1...")
-			ogg_1 = AudioSegment.from_file(osu_map.audio1_path, format="ogg")  # create AudioSegment object from pydub library
-			ogg_1 += percentTodB(osu_map.audio1_volume)  # adjust volume
-			if osu_map.audio2_path == "":  # audio 1 only
-				self.status("Exporting the audio as mp3...")
-				ogg_1.export(f"{self.folder_path}/audio.mp3", format="mp3", bitrate="192k")  # create the audio file
+				self.exportFolderArchive(osu_map, path, audio_cache_key, cached_audio_path)
+
+			# 7. Done ^^
+			self.status("Export done. The .osz has been created.")
+			self.stage_timer.finish()
+			if self.timings_format != "":
+				self.writeStageTimings(f"{os.path.splitext(self.osz_path)[0]}.{'trace' if self.timings_format == 'chrome' else 'timings'}.json", self.timings_format)
+			if self.exporting_window != None and self.exporting_window.window != None:
+				self.exporting_window.finish(self.osz_path)  # function called for the GUI when export is complete
+		
+		except SystemExit:  # don't call crash window whe the window is closed or when the export is cancelled (Export_cancelled)
+			pass
+		except:
+			if not(self.show_crash_window):
+				raise
+			from crash_window import Crash_window  # imported only here, so tkinter isn't needed without GUI
+			error_window = Crash_window(traceback.format_exc())
+			error_window.openWindow()
+		finally:
+			self.stage_timer.finish()  # if the export stopped before the end
+			for fnf_chart in osu_map.fnf_charts.values():
+				fnf_chart.cancel_token = None
+			if profiler != None:
+				profiler.stop()
+				self.writeProfile(profiler, path)
+
+	def exportAudio(self, osu_map, audio_path, audio_cache_key=None, cached_audio_path=None):
+		"""
+			Class method:
+				Step 2 of exportAsOsz(): create the audio.mp3 from the audio file(s) of osu_map.
+				Runs in another thread than the rest of the export (its stages are measured separately, see self.stage_timer).
+				How it's created depends on self.audio_backend: "ffmpeg" (see exportAudioFfmpeg()), "stream" (see exportAudioStream()) or "pydub" (see exportAudioPydub()).
+				If the "ffmpeg" or "stream" backend fails, pydub is used instead.
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+				audio_path (str): where to create the mp3.
+				(optional) audio_cache_key (str): key of the audio in self.audio_cache, to add the created audio.mp3 to the cache.
+				(optional) cached_audio_path (str): the audio.mp3 found in the cache for this audio. If defined, it's used instead of creating the audio.
+			Returns:
+				Nothing.
+		"""
+		try:
+			if cached_audio_path != None:
+				self.status("Importing the audio from the cache...")
+				if cached_audio_path != audio_path:  # else the cached file is used as is
+					shutil.copyfile(cached_audio_path, audio_path)
+				return
+
+			if self.audio_backend != "pydub":
+				try:
+					if self.audio_backend == "stream":
+						self.exportAudioStream(osu_map, audio_path)
+					else:
+						self.exportAudioFfmpeg(osu_map, audio_path)
+				except (ImportError, OSError, RuntimeError) as error:  # ffmpeg not found or too old for the filters, or no audioop: pydub does it instead
+					print(f"WARNING: the audio can't be created with the '{self.audio_backend}' audio backend, pydub is used instead. ({error})")
+					with self.__status_lock:
+						self.__export_total_steps += 1 if osu_map.audio2_path == "" else 3  # the steps of pydub instead of the single one
+					self.exportAudioPydub(osu_map, audio_path)
 			else:
-				self.status("Importing audio file 2...")
-				ogg_2 = AudioSegment.from_file(osu_map.audio2_path, format="ogg")  # create a 2nd AudioSegment object
-				ogg_2 += percentTodB(osu_map.audio2_volume)  # adjust volume
-				self.status("Merging the audios 1 and 2...")
-				final_audio = ogg_1.overlay(ogg_2, position=0)  # put the 2 audios at the same time
-				self.status("Exporting the audio as mp3...")
-				final_audio.export(f"{self.folder_path}/audio.mp3", format="mp3", bitrate="192k") 
+				self.exportAudioPydub(osu_map, audio_path)
 
+			if audio_cache_key != None:  # keep it for the next exports
+				self.audio_cache.addFile(audio_cache_key, audio_path)
+		finally:
+			self.stage_timer.endStage()  # the audio thread has nothing else to do
+
+	def exportAudioFfmpeg(self, osu_map, audio_path):
+		"""
+			Class method:
+				Create the audio.mp3 with the "ffmpeg" audio backend: the volumes, the mix and the mp3 encoding are done by a single ffmpeg command,
+				reading the audio files directly (the audio is never decoded in Python).
+				The audios are mixed like with pydub: the volumes are added (no normalization), and the length is the one of the audio 1.
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+				audio_path (str): where to create the mp3.
+			Returns:
+				Nothing.
+		"""
+		self.status("Mixing and exporting the audio as mp3...")
+		command = [ffmpeg_path, "-y", "-nostdin", "-hide_banner", "-loglevel", "error", "-i", osu_map.audio1_path]
+		if osu_map.audio2_path == "":  # audio 1 only
+			command += ["-map", "0:a:0", "-filter:a", f"volume={percentTodB(osu_map.audio1_volume)}dB"]
+		else:
+			command += ["-i", osu_map.audio2_path, "-filter_complex",
+				f"[0:a:0]volume={percentTodB(osu_map.audio1_volume)}dB[audio1];"
+				f"[1:a:0]volume={percentTodB(osu_map.audio2_volume)}dB[audio2];"
+				"[audio1][audio2]amix=inputs=2:duration=first:normalize=0[audio]",
+				"-map", "[audio]"]
+		command += ["-c:a", "libmp3lame", "-b:a", self.audio_bitrate, "-f", "mp3", audio_path]
+		self.runFfmpeg(command)
+
+	def exportAudioPydub(self, osu_map, audio_path):
+		"""
+			Class method:
+				Create the audio.mp3 with the "pydub" audio backend: the audio files are decoded, mixed in Python, then encoded by ffmpeg.
+				Slower and needs much more memory than exportAudioFfmpeg(), but works with the old versions of ffmpeg.
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+				audio_path (str): where to create the mp3.
+			Returns:
+				Nothing.
+		"""
+		from pydub import AudioSegment  # imported only here, the "ffmpeg" audio backend doesn't need it
+
+		self.status("Importing audio file 1...")
+		ogg_1 = AudioSegment.from_file(osu_map.audio1_path, format="ogg")  # create AudioSegment object from pydub library
+		ogg_1 += percentTodB(osu_map.audio1_volume)  # adjust volume
+		if osu_map.audio2_path == "":  # audio 1 only
+			self.status("Exporting the audio as mp3...")
+			self.encodeMp3(ogg_1, audio_path)  # create the audio file
+		else:
+			self.status("Importing audio file 2...")
+			ogg_2 = AudioSegment.from_file(osu_map.audio2_path, format="ogg")  # create a 2nd AudioSegment object
+			ogg_2 += percentTodB(osu_map.audio2_volume)  # adjust volume
+			self.status("Merging the audios 1 and 2...")
+			final_audio = ogg_1.overlay(ogg_2, position=0)  # put the 2 audios at the same time
+			self.status("Exporting the audio as mp3...")
+			self.encodeMp3(final_audio, audio_path)
+
+	def exportAudioStream(self, osu_map, audio_path):
+		"""
+			Class method:
+				Create the audio.mp3 with the "stream" audio backend: each audio file is decoded by ffmpeg as raw PCM into a pipe,
+				the audios are mixed chunk by chunk in Python (the samples are clipped instead of overflowing), and each mixed chunk is sent to the ffmpeg which encodes the mp3.
+				Only 1 chunk of each audio is in memory at the same time, whatever the length of the song.
+				The audios are mixed like with pydub: the length is the one of the audio 1.
+				Needs the audioop module (included in Python until 3.12, else in the audioop-lts package).
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+				audio_path (str): where to create the mp3.
+			Returns:
+				Nothing.
+		"""
+		import audioop  # imported only here, deprecated since Python 3.11
+
+		sample_rate = 44100
+		channels = 2
+		sample_width = 2  # 16 bits signed samples (s16le)
+		chunk_size = 65536 * channels * sample_width  # bytes of PCM read from each audio at once
+		pcm_format = ["-f", "s16le", "-ar", str(sample_rate), "-ac", str(channels)]
+
+		self.status("Mixing and exporting the audio as mp3 (streaming)...")
+		audio_paths = [osu_map.audio1_path] if osu_map.audio2_path == "" else [osu_map.audio1_path, osu_map.audio2_path]
+		gains = [10 ** (percentTodB(volume) / 20) for volume in [osu_map.audio1_volume, osu_map.audio2_volume][0:len(audio_paths)]]  # dB to amplitude, like AudioSegment.apply_gain()
+
+		processes = []  # the decoders, then the encoder
+		try:
+			for path in audio_paths:
+				processes.append(self.startFfmpeg([ffmpeg_path, "-nostdin", "-hide_banner", "-loglevel", "error", "-i", path, "-map", "0:a:0"] + pcm_format + ["pipe:1"], stdout=subprocess.PIPE))
+			encoder = self.startFfmpeg([ffmpeg_path, "-y", "-hide_banner", "-loglevel", "error"] + pcm_format + ["-i", "pipe:0", "-c:a", "libmp3lame", "-b:a", self.audio_bitrate, "-f", "mp3", audio_path], stdin=subprocess.PIPE)
+			processes.append(encoder)
+			decoders = processes[0:len(audio_paths)]
+
+			try:
+				while True:
+					self.cancel_token.check()
+					chunk = decoders[0].stdout.read(chunk_size)
+					chunk = chunk[0:len(chunk) - len(chunk) % sample_width]
+					if len(chunk) == 0:  # end of the audio 1
+						break
+					mixed_chunk = audioop.mul(chunk, sample_width, gains[0])
+					if len(decoders) == 2:
+						chunk_2 = decoders[1].stdout.read(len(chunk))
+						chunk_2 += bytes(len(chunk) - len(chunk_2))  # silence after the end of the audio 2
+						mixed_chunk = audioop.add(mixed_chunk, audioop.mul(chunk_2, sample_width, gains[1]), sample_width)  # audioop clips the samples
+					encoder.stdin.write(mixed_chunk)
+				encoder.stdin.close()
+			except BrokenPipeError:  # the encoder has been terminated by cancel(), or it failed
+				self.cancel_token.check()
+
+			for decoder in decoders[1:]:  # the audio 2 may be longer than the audio 1
+				if decoder.poll() == None:
+					decoder.kill()
+			for process in processes:
+				process.wait()
+			self.cancel_token.check()
+			for process in [decoders[0], encoder]:
+				if process.returncode != 0:
+					process.stderr.seek(0)
+					raise RuntimeError(f"ffmpeg failed (code {process.returncode}):\n{process.stderr.read().decode('utf-8', 'replace')[-2000:]}")
+		finally:
+			for process in processes:
+				if process.poll() == None:
+					process.kill()
+					process.wait()
+				for pipe in [process.stdin, process.stdout, process.stderr]:
+					if pipe != None:
+						try:
+							pipe.close()
+						except BrokenPipeError:  # the data which couldn't be sent to the encoder
+							pass
+				self.cancel_token.removeProcess(process)
+
+	def exportDirectArchive(self, osu_map, path, audio_cache_key=None, cached_audio_path=None):
+		"""
+			Class method:
+				Steps 1 to 6 of exportAsOsz() with direct_archive: write every file directly into the .osz, without any folder.
+				The .osu files are created in memory while the audio.mp3 is created, then the .osz is written by writeOsz().
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+				path (str): where to create the .osz
+				(optional) audio_cache_key, cached_audio_path: see exportAudio().
+			Returns:
+				Nothing.
+		"""
+		# 1. find the name of the .osz
+		self.status("Creating the .osz file...")
+		osz_path = self.getOszPath(path)
+
+		# 2. the audio.mp3 is created in a temporary file if it isn't in the cache
+		if cached_audio_path != None:
+			audio_path = cached_audio_path
+		else:
+			temp_audio_file, self.temp_audio_path = tempfile.mkstemp(suffix=".mp3")
+			os.close(temp_audio_file)
+			audio_path = self.temp_audio_path
+
+		try:
+			# 2. create the audio.mp3, at the same time as the step 4
+			osu_files = {}  # {file name: content}
+			self.runAudioAndCharts((self.exportAudio, osu_map, audio_path, audio_cache_key, cached_audio_path), lambda: self.exportOsuFiles(osu_map, osu_files=osu_files))
+
+			# 3. and 5. write the .osz with the background, the .osu files and the audio
+			if osu_map.background_path != "":
+				self.status("Importing the background...")
+			self.status("Adding the audio to the .osz file...")
+			self.writeOsz(osu_map, osz_path, audio_path, osu_files=osu_files)
+
+		finally:
+			# 6. remove the temporary audio
+			if self.temp_audio_path != "":
+				os.remove(self.temp_audio_path)
+				self.temp_audio_path = ""
+		print(self.osz_path)
+
+	def exportFolderArchive(self, osu_map, path, audio_cache_key=None, cached_audio_path=None):
+		"""
+			Class method:
+				Steps 1 to 6 of exportAsOsz() without direct_archive: create all files in a folder, then compress it as .osz and delete the folder.
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+				path (str): where to create the .osz
+				(optional) audio_cache_key, cached_audio_path: see exportAudio().
+			Returns:
+				Nothing.
+		"""
+		# 1. create the folder with all files to compress
+		self.status("Creating the folder...")
+
+		# get the full path of the folder
+		if path != "":  # if custom path defined
+			self.folder_path = f"{path}/{self.folder_name}"
+		else:
+			self.folder_path = self.folder_name  # attribute useful if the folder has to be removed (should be set BEFORE creating the folder)
+		# create the folder
+		os.makedirs(self.folder_path, exist_ok=True)  # disable errors if the folder already exists
+
+		print(self.folder_path)
+
+		def exportCharts():
 			# 3. create the background
 			if osu_map.background_path != "":
 				self.status("Importing the background...")
 				shutil.copyfile(osu_map.background_path, f"{self.folder_path}/background.jpg")
 
 			# 4. create the .OSU file
-			for k in osu_map.fnf_charts.keys():
+			self.exportOsuFiles(osu_map)
+
+		# 2. create the audio.mp3, at the same time as the steps 3 and 4
+		self.runAudioAndCharts((self.exportAudio, osu_map, f"{self.folder_path}/audio.mp3", audio_cache_key, cached_audio_path), exportCharts)
+
+		# 5. compress all the folder to the .osz (fun fact: the .osz file is just a .zip)
+		self.status("Compressing the generated folder to .osz file...")
+		# get .osz name and path
+		self.osz_path = self.getOszPath(path)
+		self.osz_name = os.path.basename(self.osz_path)
+		# create the .osz (basically a .zip)
+		shutil.make_archive(self.folder_path, "zip", self.folder_path) # create a zip with all files created
+		os.rename(f"{self.folder_path}.zip", f"{self.osz_path}") # changing the extension file from ".zip" to ".osz" by renaming it
+
+		# 6. remove the created folder (because now the files are in the .osz)
+		self.status("Removing previously generated folder...")
+		shutil.rmtree(self.folder_path)
+
+	def exportIncrementalArchive(self, osu_map, path, audio_cache_key=None, cached_audio_path=None, audio_hashes=None):
+		"""
+			Class method:
+				Steps 1 to 6 of exportAsOsz() with incremental: the audio.mp3 and the .osu files of the last export of the mapset are kept in its build folder,
+				with the fingerprint of everything used to generate them (see Build_manifest). Only the files whose fingerprint changed are generated again,
+				then the .osz is created from the files of the build folder (or kept as is if nothing changed).
+				The .osz is always "<folder name>.osz": it replaces the one of the last export.
+				A .osz with this name which doesn't come from an incremental export (the manifest has no entry for it) is never replaced: the export fails instead.
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+				path (str): where to create the .osz
+				(optional) audio_cache_key, cached_audio_path: see exportAudio().
+				(optional) audio_hashes (list of str): the hash of each audio file, from getAudioHashes(). None (default) = the audio files are read.
+			Returns:
+				Nothing.
+		"""
+		# 1. find what changed since the last export
+		self.status("Looking for the changes since the last export...")
+		osz_path = removeIllegalCharacters(self.folder_name + ".osz")
+		build_path = f"{build_folder_name}/{self.folder_name}"
+		if path != "":
+			osz_path = f"{path}/{osz_path}"
+			build_path = f"{path}/{build_path}"
+		manifest = Build_manifest(build_path)
+
+		chart_hashes = {}  # {chart path: hash}, each chart is read once even if it's used by several difficulties
+		osu_fingerprints = {}  # {.osu file name: fingerprint}
+		dirty_difficulties = []  # the difficulties to generate again
+		dirty_files = []  # the files of the build folder to generate again
+		for k in osu_map.fnf_charts.keys():
+			fnf_chart = osu_map.fnf_charts[k]
+			if not(fnf_chart.map_path in chart_hashes):
+				chart_hashes[fnf_chart.map_path] = getFileHash(fnf_chart.map_path)
+			osu_file_name = fnf_chart.getOsuFileName(k, osu_map.creator)
+			osu_fingerprints[osu_file_name] = getFingerprint({
+				"chart": chart_hashes[fnf_chart.map_path], "map_mode": fnf_chart.map_mode, "difficulty": k,
+				"title": osu_map.title, "artist": osu_map.artist, "creator": osu_map.creator, "tags": osu_map.tags,
+				"background": osu_map.background_path != "", "bpm": osu_map.custom_bpm, "meter": osu_map.meter, "offset": osu_map.offset,
+				"converter": getConverterHash(self.app_version)
+			})
+			if not(manifest.isUpToDate(osu_file_name, osu_fingerprints[osu_file_name])):
+				dirty_difficulties.append(k)
+				dirty_files.append(osu_file_name)
+
+		if audio_hashes == None:
+			audio_hashes = self.getAudioHashes(osu_map)
+		audio_fingerprint = getFingerprint({
+			"audio": audio_hashes, "volumes": [osu_map.audio1_volume, osu_map.audio2_volume][0:len(audio_hashes)],
+			"bitrate": self.audio_bitrate, "backend": self.audio_backend
+		})
+		is_audio_dirty = not(manifest.isUpToDate("audio.mp3", audio_fingerprint))
+		if is_audio_dirty:
+			dirty_files.append("audio.mp3")
+		background_fingerprint = getFileHash(osu_map.background_path) if osu_map.background_path != "" else None
+		osz_fingerprint = getFingerprint({"osu_files": osu_fingerprints, "audio": audio_fingerprint, "background": background_fingerprint})
+		is_osz_dirty = not(manifest.isUpToDate(".osz", osz_fingerprint, osz_path))
+		if is_osz_dirty and not(".osz" in manifest.entries) and fileExists(osz_path):  # for example created by an export without incremental
+			raise FileExistsError(f"'{osz_path}' doesn't come from an incremental export, so it isn't replaced. Move or delete it, or export without incremental export.")
+
+		with self.__status_lock:
+			self.__export_total_steps = self.__export_current_step + len(dirty_difficulties) + 1  # steps 4 and 7
+			if is_audio_dirty:
+				self.__export_total_steps += self.getAudioStepsCount(osu_map, cached_audio_path)  # step 2
+			if is_osz_dirty:
+				self.__export_total_steps += 1  # step 5
+		print(f"{len(osu_fingerprints) - len(dirty_difficulties)} .osu file(s) and {'no' if is_audio_dirty else 'the'} audio reused from the last export ('{build_path}')")
+
+		# the files about to be generated again are forgotten first, so an unfinished export never leaves a wrong fingerprint
+		manifest.removeEntries(dirty_files)
+		if is_osz_dirty and ".osz" in manifest.entries:
+			manifest.setEntry(".osz", "")  # still the .osz of the incremental exports, but never up to date
+		manifest.save()
+
+		# 2. to 4. generate the audio and the .osu files which changed
+		audio_task = (self.exportAudio, osu_map, manifest.getFilePath("audio.mp3"), audio_cache_key, cached_audio_path) if is_audio_dirty else None
+		self.runAudioAndCharts(audio_task, lambda: self.exportOsuFiles(osu_map, folder_path=build_path, difficulties=dirty_difficulties))
+		manifest.setEntry("audio.mp3", audio_fingerprint)
+		for osu_file_name in osu_fingerprints.keys():
+			manifest.setEntry(osu_file_name, osu_fingerprints[osu_file_name])
+		manifest.removeUnusedFiles(list(osu_fingerprints.keys()) + ["audio.mp3", ".osz"])  # for example the removed difficulties
+
+		# 5. and 6. create the .osz from the build folder (the .osz of the last export is kept if this one is cancelled, see writeOsz())
+		if is_osz_dirty:
+			self.status("Creating the .osz file from the build folder...")
+			self.writeOsz(osu_map, osz_path, manifest.getFilePath("audio.mp3"), osu_paths={osu_file_name: manifest.getFilePath(osu_file_name) for osu_file_name in osu_fingerprints.keys()})
+		else:
+			self.osz_path = osz_path
+			self.osz_name = os.path.basename(osz_path)
+		manifest.setEntry(".osz", osz_fingerprint)
+		manifest.save()
+		print(self.osz_path)
+
+	def exportOsuFiles(self, osu_map, osu_files=None, folder_path=None, difficulties=None):
+		"""
+			Class method:
+				Step 4 of exportAsOsz(): create the .osu file of each difficulty in self.folder_path, or in osu_files if defined.
+				The difficulties are generated at the same time in several processes (see self.getWorkersCount()), but the status is still updated in order.
+				If a difficulty fails, the ones that haven't started yet are cancelled, and the error is raised.
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+				(optional) osu_files (dict): where to save the content of the .osu files instead of creating them, {file name: content (str)} (with direct_archive).
+				(optional) folder_path (str): where to create the .osu files without osu_files, instead of self.folder_path (with incremental).
+				(optional) difficulties (list of str): the names of the difficulties to create. All of them by default.
+			Returns:
+				Nothing.
+		"""
+		if folder_path == None:
+			folder_path = self.folder_path
+		if difficulties == None:
+			difficulties = list(osu_map.fnf_charts.keys())
+		if len(difficulties) == 0:
+			return
+		workers_count = self.getWorkersCount(len(difficulties))
+
+		# what each difficulty has to do, and what to do with its result
+		def getTask(k):
+			if osu_files != None:  # the content is returned, then added to the .osz by writeOsz()
+				return (osu_map.fnf_charts[k].getOsuFileContent, k, osu_map.creator, osu_map.tags)
+			else:  # the file is directly created in the folder
+				return (osu_map.fnf_charts[k].exportOsuFile, folder_path, k, osu_map.creator, osu_map.tags)
+		def saveResult(k, result):
+			if osu_files != None:
+				osu_files[osu_map.fnf_charts[k].getOsuFileName(k, osu_map.creator)] = result
+
+		if workers_count <= 1:  # 1 difficulty after the other
+			for k in difficulties:
 				self.status(f"Creating the .osu file for the difficulty '{k}'...")
-				osu_map.fnf_charts[k].exportOsuFile(self.folder_path, k, osu_map.creator, osu_map.tags)
-
-			# 5. compress all the folder to the .osz (fun fact: the .osz file is just a .zip)
-			self.status("Compressing the generated folder to .osz file...")
-			# get .osz name and path
-			self.osz_name = removeIllegalCharacters(self.folder_name + ".osz")
-			if path != "":
-				self.osz_path = f"{path}/{self.osz_name}"
-			else:
-				self.osz_path = self.osz_name
-			# create the .osz (basically a .zip)
-			shutil.make_archive(self.folder_path, "zip", self.folder_path) # create a zip with all files created
+				task = getTask(k)
+				saveResult(k, task[0](*task[1:]))
+			return
+
+		with ProcessPoolExecutor(max_workers=workers_count) as executor:
+			futures = [executor.submit(*getTask(k)) for k in difficulties]
+
+			def cancelOnFailure(finished_future):  # as soon as a difficulty fails, the remaining ones are useless
+				if not(finished_future.cancelled()) and finished_future.exception() != None:
+					for future in futures:
+						future.cancel()
+			for future in futures:
+				future.add_done_callback(cancelOnFailure)
+
+			try:
+				for k, future in zip(difficulties, futures):
+					self.status(f"Creating the .osu file for the difficulty '{k}'...")
+					while not(future.done()):  # the export can be cancelled while waiting
+						self.cancel_token.check()
+						wait([future], timeout=0.1)
+					saveResult(k, future.result())
+			except BaseException:
+				for future in futures:  # also when the export is stopped
+					future.cancel()
+				# raise the error of the difficulty which failed first, rather than the cancellation of another one
+				for future in futures:
+					if future.done() and not(future.cancelled()) and future.exception() != None:
+						raise future.exception()
+				raise
+
+	def getAudioCacheKey(self, osu_map, audio_hashes=None):
+		"""
+			Class method:
+				Returns the key of the audio.mp3 of osu_map in self.audio_cache (see Audio_cache.getKey()).
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+				(optional) audio_hashes (list of str): the hash of each audio file, from getAudioHashes(). None (default) = the audio files are read.
+			Returns:
+				str: the key, or None if there isn't any cache to use.
+		"""
+		if self.audio_cache == None or not(self.audio_cache.enabled):
+			return None
 
-			if os.path.isfile(self.osz_path): # checking if file exists, if it does, add a number to its name
-				count = 1
-				self.osz_path = self.folder_path + f" ({count}).osz"
-				while os.path.isfile(self.osz_path):
-					count+= 1
-					self.osz_path = self.folder_path + f" ({count}).osz"
+		mixing_mode_prefix = f"{self.audio_backend}-" if self.audio_backend != "pydub" else ""  # the backends don't create exactly the same files
+		if osu_map.audio2_path == "":  # audio 1 only
+			return self.audio_cache.getKey([osu_map.audio1_path], [percentTodB(osu_map.audio1_volume)], self.audio_bitrate, f"{mixing_mode_prefix}single", audio_hashes)
+		else:
+			return self.audio_cache.getKey([osu_map.audio1_path, osu_map.audio2_path], [percentTodB(osu_map.audio1_volume), percentTodB(osu_map.audio2_volume)], self.audio_bitrate, f"{mixing_mode_prefix}overlay", audio_hashes)
 
-			os.rename(f"{self.folder_path}.zip", f"{self.osz_path}") # changing the extension file from ".zip" to ".osz" by renaming it
+	def getAudioHashes(self, osu_map):
+		"""
+			Class method:
+				Returns the hash of the content of each audio file of osu_map (see audio_cache.getFileHash()).
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+			Returns:
+				list of str: the hash of the audio 1, then the one of the audio 2 if there is one.
+		"""
+		audio_paths = [osu_map.audio1_path] if osu_map.audio2_path == "" else [osu_map.audio1_path, osu_map.audio2_path]
+		return [getFileHash(audio_path) for audio_path in audio_paths]
 
-			# 6. remove the created folder (because now the files are in the .osz)
-			self.status("Removing previously generated folder...")
-			shutil.rmtree(self.folder_path)
+	def getAudioStepsCount(self, osu_map, cached_audio_path=None):
+		"""
+			Class method:
+				Returns the amount of steps (calls to status()) of exportAudio().
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+				(optional) cached_audio_path (str): see exportAudio().
+			Returns:
+				int: the amount of steps.
+		"""
+		if cached_audio_path != None:
+			return 1  # audio from the cache
+		elif self.audio_backend != "pydub":
+			return 1  # mixed and encoded at once
+		elif osu_map.audio2_path == "":
+			return 2  # only audio 1
+		else:
+			return 4  # audio 1 & 2
 
-			# 7. Done ^^
-			self.status("Export done. The .osz has been created.")
-			if self.exporting_window != None and self.exporting_window.window != None:
-				self.exporting_window.finish(self.osz_path)  # function called for the GUI when export is complete
-		
-		except SystemExit:  # don't call crash window whe the window is closed
-			pass
+	def getFolderName(self, osu_map):
+		"""
+			Class method:
+				Returns the name of the folder (and of the .osz) of osu_map: "artist - title".
+			Arguments:
+				osu_map (Osu_map object): the Osu_map to export.
+			Returns:
+				str: the name, without illegal characters.
+		"""
+		# artist
+		if osu_map.artist == "" or osu_map.artist == None:
+			artist = "Unknown"
+		else:
+			artist = osu_map.artist
+		return removeIllegalCharacters(f"{artist} - {osu_map.title}")
+
+	def getOszPath(self, path):
+		"""
+			Class method:
+				Returns the path of the .osz to create, from self.folder_name.
+				If a file with the same name already exists, a number is added to the name.
+			Arguments:
+				path (str): where to create the .osz ("" = current folder).
+			Returns:
+				str: path to the .osz, including the file name.
+		"""
+		if path != "":
+			base_path = f"{path}/{self.folder_name}"
+		else:
+			base_path = self.folder_name
+
+		osz_path = removeIllegalCharacters(self.folder_name + ".osz")
+		if path != "":
+			osz_path = f"{path}/{osz_path}"
+
+		if os.path.isfile(osz_path): # checking if file exists, if it does, add a number to its name
+			count = 1
+			osz_path = base_path + f" ({count}).osz"
+			while os.path.isfile(osz_path):
+				count+= 1
+				osz_path = base_path + f" ({count}).osz"
+
+		return osz_path
+
+	def getStageTimings(self):
+		"""
+			Class method:
+				Returns the time and memory used by each step of the last export.
+				The audio steps run in their own thread, so they overlap the other steps.
+			Arguments:
+				None.
+			Returns:
+				list of dict: see Stage_timer.getStages().
+		"""
+		return self.stage_timer.getStages()
+
+	def getWorkersCount(self, tasks_count):
+		"""
+			Class method:
+				Returns the amount of processes to use for tasks_count tasks, according to self.workers.
+			Arguments:
+				tasks_count (int): the amount of tasks to do (for example the amount of difficulties).
+			Returns:
+				int: the amount of processes, between 1 and tasks_count.
+		"""
+		if self.workers > 0:
+			workers_count = self.workers
+		else:  # 1 per CPU core
+			workers_count = os.cpu_count() or 1
+
+		return max(1, min(workers_count, tasks_count))
+
+	def runAudioAndCharts(self, audio_task, export_charts):
+		"""
+			Class method:
+				Steps 2 to 4 of exportAsOsz(): the audio and the charts don't depend on each other, so the audio is created in another thread at the same time as the charts.
+				Waits for both, and raises the error of the audio thread if it failed.
+				If the charts fail (or if the export is cancelled), the export is cancelled, so the audio stops right away (its ffmpeg is terminated)
+				instead of being finished for nothing, then the error of the charts is raised.
+			Arguments:
+				audio_task (tuple): the function which creates the audio, followed by its arguments. None if there isn't any audio to create.
+				export_charts (function): creates the charts in this thread, called without argument.
+			Returns:
+				Nothing.
+		"""
+		with ThreadPoolExecutor(max_workers=1) as audio_executor:
+			if audio_task != None:
+				audio_future = audio_executor.submit(*audio_task)
+			try:
+				export_charts()
+			except BaseException:
+				self.cancel_token.cancel()  # the audio thread raises Export_cancelled, which is ignored: the error of the charts is the one raised
+				raise
+			if audio_task != None:
+				audio_future.result()
+
+	def runFfmpeg(self, command, input_data=None):
+		"""
+			Class method:
+				Run an ffmpeg command until it's finished. The process is terminated if the export is cancelled.
+			Arguments:
+				command (list of str): the command, starting by the ffmpeg executable.
+				(optional) input_data (bytes): what to send to ffmpeg (read with "pipe:0"). None (default) = nothing.
+			Returns:
+				Nothing.
+		"""
+		process = subprocess.Popen(command, stdin=subprocess.PIPE if input_data != None else subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE)
+		self.cancel_token.addProcess(process)
+		try:
+			error_output = process.communicate(input_data)[1]
+		finally:
+			self.cancel_token.removeProcess(process)
+		self.cancel_token.check()  # ffmpeg has been terminated by cancel()
+		if process.returncode != 0:
+			raise RuntimeError(f"ffmpeg failed (code {process.returncode}):\n{error_output.decode('utf-8', 'replace')[-2000:]}")
+
+	def startFfmpeg(self, command, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL):
+		"""
+			Class method:
+				Start an ffmpeg command without waiting for it. The process is terminated if the export is cancelled.
+				Its errors are written in a temporary file (process.stderr), so ffmpeg is never blocked by a full pipe.
+			Arguments:
+				command (list of str): the command, starting by the ffmpeg executable.
+				(optional) stdin, stdout: see subprocess.Popen. Nothing by default.
+			Returns:
+				subprocess.Popen: the process. It has to be removed from self.cancel_token when it's finished.
+		"""
+		error_file = tempfile.TemporaryFile()
+		try:
+			process = subprocess.Popen(command, stdin=stdin, stdout=stdout, stderr=error_file)
 		except:
-			error_window = Crash_window(traceback.format_exc())
-			error_window.openWindow()
+			error_file.close()
+			raise
+		process.stderr = error_file
+		self.cancel_token.addProcess(process)
+		return process
 
 	def status(self, new_status):
 		"""
@@ -722,23 +1497,99 @@ class Osz_converter:
 			Return:
 				Nothing.
 		"""
-		self.__export_current_step += 1  # update current step number (+1)
+		self.cancel_token.check()  # each step is a place where the export can stop
+		with self.__status_lock:
+			self.stage_timer.startStage(new_status)  # the previous step of this thread ends here
+			self.__export_current_step += 1  # update current step number (+1)
+
+			# calculate the percentage
+			if self.__export_total_steps == 0:  # unknown total steps
+				percentage = 0
+			else:
+				percentage = int((self.__export_current_step/self.__export_total_steps) * 100)
+
+			# view (still locked, so the percentage displayed never goes back)
+			if self.exporting_window != None:  # if window defined to follow the status
+				if self.exporting_window.window != None:  # if he's open
+					self.exporting_window.changeTitle(f"Export as .osz in progress... ({percentage}%)")
+					self.exporting_window.changeStatus(new_status)
+				else:
+					print("WARNING: Osz_converter: self.exporting_window.window is None.")
+			elif self.progress_callback != None:
+				self.progress_callback(self.__export_current_step, self.__export_total_steps, new_status)
+			else:
+				print(f"[{percentage}%] {new_status}")
 
-		# calculate the percentage
-		if self.__export_total_steps == 0:  # unknown total steps
-			percentage = 0
+	def writeOsz(self, osu_map, osz_path, audio_path, osu_files=None, osu_paths=None):
+		"""
+			Class method:
+				Write a .osz (fun fact: the .osz file is just a .zip) with the background of osu_map, the .osu files and the audio.mp3.
+				The mp3 and the background are stored as is (they're already compressed), only the .osu files are compressed.
+				The .osz is written under another name first (self.temp_osz_path), then renamed: an error or a cancel never leaves an incomplete .osz,
+				and the .osz which was already there is kept. Sets self.osz_path and self.osz_name once it's done.
+			Arguments:
+				osu_map (Osu_map object): the mapset, for its background.
+				osz_path (str): where to create the .osz (includes the file name).
+				audio_path (str): the mp3 to add as audio.mp3.
+				(optional) osu_files (dict): the .osu files created in memory, {file name: content (str)}. None by default.
+				(optional) osu_paths (dict): the .osu files to copy, {file name: path to the file}. None by default.
+			Returns:
+				Nothing.
+		"""
+		if osu_files == None:
+			osu_files = {}
+		if osu_paths == None:
+			osu_paths = {}
+		self.temp_osz_path = f"{osz_path}.tmp"
+		try:
+			with ZipFile(self.temp_osz_path, "w") as osz_file:
+				if osu_map.background_path != "":
+					osz_file.write(osu_map.background_path, "background.jpg", compress_type=ZIP_STORED)
+				for osu_file_name in osu_files.keys():
+					osz_file.writestr(osu_file_name, osu_files[osu_file_name].encode("utf-8"), compress_type=ZIP_DEFLATED)
+				for osu_file_name in osu_paths.keys():
+					osz_file.write(osu_paths[osu_file_name], osu_file_name, compress_type=ZIP_DEFLATED)
+				osz_file.write(audio_path, "audio.mp3", compress_type=ZIP_STORED)
+			os.replace(self.temp_osz_path, osz_path)
+		finally:
+			if fileExists(self.temp_osz_path):  # unfinished
+				os.remove(self.temp_osz_path)
+			self.temp_osz_path = ""
+		self.osz_path = osz_path
+		self.osz_name = os.path.basename(osz_path)
+
+	def writeProfile(self, profiler, path):
+		"""
+			Class method:
+				Write the results of the profiling of the last export next to the .osz (<.osz name>.prof and <.osz name>.folded).
+				If the .osz hasn't been created, they're named from the folder name.
+			Arguments:
+				profiler (Export_profiler): the profiler of the export.
+				path (str): where the .osz is created.
+			Returns:
+				Nothing.
+		"""
+		if self.osz_path != "":
+			base_path = os.path.splitext(self.osz_path)[0]
 		else:
-			percentage = int((self.__export_current_step/self.__export_total_steps) * 100)
+			base_path = os.path.join(path, self.folder_name if self.folder_name != "" else "export")
+		try:
+			for file_path in profiler.writeFiles(base_path):
+				print(f"Profile written in '{file_path}'.")
+		except OSError:
+			print(f"WARNING: error while trying to write the profile of the export ('{base_path}')")
 
-		# view
-		if self.exporting_window != None:  # if window defined to follow the status
-			if self.exporting_window.window != None:  # if he's open
-				self.exporting_window.changeTitle(f"Export as .osz in progress... ({percentage}%)")
-				self.exporting_window.changeStatus(new_status)
-			else:
-				print("WARNING: Osz_converter: self.exporting_window.window is None.")
-		else:
-			print(f"[{percentage}%] {new_status}")
+	def writeStageTimings(self, file_path, trace_format="json"):
+		"""
+			Class method:
+				Write the time and memory used by each step of the last export in a file.
+			Arguments:
+				file_path (str): where to write.
+				(optional) trace_format (str): "json" (default) or "chrome" (for chrome://tracing or Perfetto). See Stage_timer.writeFile().
+			Returns:
+				Nothing.
+		"""
+		self.stage_timer.writeFile(file_path, trace_format)
 
 def bpmToMs(bpm):
 	"""
@@ -754,6 +1605,32 @@ def bpmToMs(bpm):
 	else:
 		return 60000/bpm
 
+def compactChartData(json_data):
+	"""
+		Method:
+			Keep only the gameplay data of a parsed FnF chart: the BPM, the scroll speed, and for each section its notes, mustHitSection, BPM change and length.
+			Everything else (events, characters, stage, altAnim, gfSection...) is dropped, so it isn't kept in memory by chart_cache.
+			The kept values are the same objects, and a missing key stays missing (the errors are the same than with the full chart).
+		Argument:
+			json_data (dict) : the parsed chart, from jsonLoadExtraData().
+		Return:
+			(dict) : the compact chart. json_data is returned as is if it doesn't look like a chart.
+	"""
+	if type(json_data) != dict or type(json_data.get("song")) != dict:
+		return json_data
+
+	song_data = {key: json_data["song"][key] for key in chart_song_keys if key in json_data["song"]}
+	if type(song_data.get("notes")) == list:
+		song_data["notes"] = [
+			{key: section[key] for key in chart_section_keys if key in section} if type(section) == dict else section
+			for section in song_data["notes"]
+		]
+
+	compact_data = {"song": song_data}
+	if "bpm" in json_data:  # read before json_data["song"]["bpm"] (see Fnf_chart.getBPM())
+		compact_data["bpm"] = json_data["bpm"]
+	return compact_data
+
 def fileExists(file_path):
 	"""
 		Method:
@@ -771,6 +1648,58 @@ def fileExists(file_path):
 	else:
 		return True
 
+def forgetChart(cache_key):
+	"""
+		Method:
+			Remove a chart from chart_cache, with its entries in sanitized_notes_cache and timing_index_cache.
+		Argument:
+			cache_key (str) : the absolute path of the chart.
+		Return:
+			Nothing.
+	"""
+	chart_cache.pop(cache_key, None)
+	sanitized_notes_cache.pop(cache_key, None)
+	for timing_key in [key for key in timing_index_cache.keys() if key[0] == cache_key]:
+		del timing_index_cache[timing_key]
+
+def getConverterHash(app_version=""):
+	"""
+		Method:
+			Returns a hash of the version of the application and of the code which generates the .osu files,
+			so the files of an incremental export made by another version of the converter aren't reused.
+			The code is read only once. If it can't be read (for example in an executable), only the version is used.
+		Argument:
+			(optional) app_version (str): the version of the application (from config.json). "" by default.
+		Return:
+			(str) : the hash.
+	"""
+	global converter_hash
+	if converter_hash == None:
+		try:
+			code_folder = os.path.dirname(os.path.abspath(__file__))
+			converter_hash = getFingerprint([getFileHash(os.path.join(code_folder, file_name)) for file_name in ["fnf_converter.py", "timing_index.py"]])
+		except OSError:
+			converter_hash = ""
+	return getFingerprint({"code": converter_hash, "version": app_version})
+
+def getSectionSteps(section):
+	"""
+		Method:
+			Returns the length of a section of a FnF chart in steps (4 steps = 1 beat), like in FnF:
+			sectionBeats * 4 (Psych Engine), or lengthInSteps (FnF, Kade Engine), else 16.
+		Argument:
+			section (dict) : the section, from json_data["song"]["notes"].
+		Return:
+			(int or float) : the amount of steps.
+	"""
+	section_beats = section.get("sectionBeats")
+	if type(section_beats) in [int, float] and section_beats > 0:
+		return section_beats * 4
+	length_in_steps = section.get("lengthInSteps")
+	if type(length_in_steps) in [int, float] and length_in_steps > 0:
+		return length_in_steps
+	return 16
+
 def is_a_float(string_to_verify):
 	""" 
 		Method:
@@ -817,66 +1746,136 @@ def is_a_int(string_to_verify):
 	
 	return can_be_converted
 
-def jsonRemoveExtraData(file_path):
+def jsonDecodeExtraData(file_path):
 	"""
 		Method:
-			Read and remove extradata of a JSON file. Do not modify the file and returns a str.
+			Read a JSON file which may have extradata before and after the JSON object, and decode the object.
+			The file is memory-mapped: the first '{' and the last '}' are found directly in the mapped bytes, and only the text between them is decoded as str,
+			so the chart is in memory only once (as str) while it's parsed. The mapping is released right after.
+			The end of the object is found by the JSON decoder itself, in linear time.
+			If this text isn't valid UTF-8, only the part before the first invalid character is decoded: the file is valid if the object ends before it
+			(the invalid character is in the extradata after the object), and invalid otherwise.
 		Argument:
 			file_path (str) : path to the json file.
 		Return:
-			(str) : content of the json file on a str.
+			(tuple) : (decoded dict, file content from the first '{' to the matching '}' (str), index of the first '{' in this str (0), index just after the matching '}').
+			Returns None if the file doesn't contain a valid JSON object.
 	"""
-	with open(file_path, "r", encoding="utf-8") as file:
-		# to avoid bug, we have to remove extra data
-		file_data = file.readlines()
+	with open(file_path, "rb") as file:
+		if os.fstat(file.fileno()).st_size < 2:  # the file is too short to continue... (and an empty file can't be mapped)
+			print("Invalid JSON file ("+file_path+"): empty or too short file.")
+			return None
+
+		with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as mapped_file:
+			# get the interesting json part (between, {})
+			index_start = mapped_file.find(b"{")  # first '{' (never part of another UTF-8 character)
+			if index_start == -1:  # value no found
+				print("Invalid JSON file ("+file_path+"): character '{' not found.")
+				return None
+			index_last = mapped_file.rfind(b"}")  # last '}'
+			if index_last < index_start:
+				print("Invalid JSON file ("+file_path+"): character '}' not found.")
+				return None
+
+			unicode_error = None  # the first invalid UTF-8 character, if there is one
+			with memoryview(mapped_file)[index_start:index_last+1] as json_bytes:  # decoded without copying the bytes first
+				try:
+					file_data = str(json_bytes, "utf-8")
+				except UnicodeDecodeError as error:  # maybe in the extradata after the object: the text before is decoded
+					unicode_error = error
+					file_data = str(json_bytes[0:error.start], "utf-8")
+
+	# decode the object: raw_decode() stops at the '}' which closes the first '{' and ignores the rest
+	index_start = 0
+	try:
+		json_data, index_end = json.JSONDecoder().raw_decode(file_data, index_start)
+	except json.JSONDecodeError as error:
+		if unicode_error != None:  # the object doesn't end before the invalid character
+			print("Invalid JSON file ("+file_path+"): "+str(unicode_error)+".")
+		else:
+			print("Invalid JSON file ("+file_path+"): "+str(error)+".")
+		return None
 
-		while len(file_data) > 1:  # move all lines to the index 0
-			file_data[0] += file_data.pop(1)
+	return (json_data, file_data[0:index_end], index_start, index_end)  # without the extradata after the object (not copied if there isn't any)
 
-	if len(file_data[0]) < 2:  # the file is too short to continue...
-		print("Invalid JSON file ("+file_path+"): empty or too short file.")
+def jsonLoadExtraData(file_path):
+	"""
+		Method:
+			Read and parse a JSON file as a dict, ignoring its extradata (see jsonRemoveExtraData()).
+			Faster than json.loads(jsonRemoveExtraData(file_path)) since the file is decoded only once.
+		Argument:
+			file_path (str) : path to the json file.
+		Return:
+			(dict) : content of the json file.
+	"""
+	decoded_file = jsonDecodeExtraData(file_path)
+	if decoded_file == None:  # same error than json.loads("")
+		raise json.JSONDecodeError("Invalid JSON file", "", 0)
+	return decoded_file[0]
+
+def jsonRemoveExtraData(file_path):
+	"""
+		Method:
+			Read and remove extradata of a JSON file (see jsonDecodeExtraData()). Do not modify the file and returns a str.
+		Argument:
+			file_path (str) : path to the json file.
+		Return:
+			(str) : content of the json file on a str. Empty str if the file is invalid.
+	"""
+	decoded_file = jsonDecodeExtraData(file_path)
+	if decoded_file == None:
 		return "" # the function will return nothing
 
-	# get the beginning and the end of the interesting json part (between, {})
-	# note: the file content is file_data[0]
-	index_start = 0  # first '{'
-	index_end = 0  # last '}'
-	# get index_start
-	i = 0
-	while i < len(file_data[0]) and file_data[0][i] != "{":
-		i += 1
-
-	if index_start >= len(file_data[0]):  # value no found
-		raise "Invalid JSON file: Character '{' no found."
-	else:
-		index_start = i
-
-	# get index_end
-	level = 1  # current level inside the json. The goal is to find the } which close the { at index_start
-	in_str = False  # true if i is between "" (ignore the content)
-	while i < len(file_data[0]):
-		i += 1
-		if i >= len(file_data[0]):  # i out of range
-			#print(level)
-			print("Invalid JSON file ("+file_path+"): missing '}'.")
-			return ""
-		else:
-			if file_data[0][i] == '"':  # found a "
-				in_str = not(in_str)  # switch between true and false
-			elif file_data[0][i] == '{' and in_str == False:  # we go deeper~
-				level += 1
-			elif file_data[0][i] == '}' and in_str == False:
-				level -= 1
-				if level < 0:  # idk how it's possible
-					print("Invalid JSON file ("+file_path+"): unexcepted '}'.")
-					return ""
-				elif level == 0:  # we found what we are looking for yay
-					index_end = i
-					return file_data[0][index_start:index_end+1]  # return cropped str
-			# for other characters, do nothing
-	
-	# If nothing goes wrong the code never goes here because it always ends by a return
-	return ""  # to be secure and avoid infinite loop
+	json_data, file_data, index_start, index_end = decoded_file
+	return file_data[index_start:index_end]  # return cropped str
+
+def loadChartData(file_path):
+	"""
+		Method:
+			Parse a FnF chart (JSON file) as a dict, using jsonLoadExtraData(), and keep only its gameplay data (see compactChartData()).
+			The result is kept in chart_cache, so a file is parsed only once, even if it's used by several difficulties.
+			The cache entry is invalidated if the modification time or the size of the file change.
+			At most chart_cache_size charts are kept: when there are more, the least recently used one is forgotten.
+		Argument:
+			file_path (str) : path to the json file.
+		Return:
+			(dict) : content of the json file. It's shared, so it must not be modified.
+	"""
+	file_stat = os.stat(file_path)
+	cache_key = os.path.abspath(file_path)
+	file_signature = (file_stat.st_mtime_ns, file_stat.st_size)
+
+	cached_chart = chart_cache.pop(cache_key, None)
+	if cached_chart != None and cached_chart[0] == file_signature:  # the file hasn't changed since the last parse
+		chart_cache[cache_key] = cached_chart  # added again at the end: most recently used
+		return cached_chart[1]
+
+	json_data = compactChartData(jsonLoadExtraData(file_path))  # parse the file as dict, the rest of the chart is freed right away
+	chart_cache[cache_key] = (file_signature, json_data)
+	while len(chart_cache) > chart_cache_size:
+		forgetChart(next(iter(chart_cache.keys())))  # the least recently used
+	return json_data
+
+def loadSanitizedNotes(file_path):
+	"""
+		Method:
+			Returns the cleaned notes of a FnF chart (see sanitizeChartNotes()).
+			The result is kept in sanitized_notes_cache as long as the chart in chart_cache is the same, so each file is cleaned only once.
+		Argument:
+			file_path (str) : path to the json file.
+		Return:
+			(list) : see sanitizeChartNotes(). It's shared, so it must not be modified.
+	"""
+	json_data = loadChartData(file_path)
+	cache_key = os.path.abspath(file_path)
+
+	cached_notes = sanitized_notes_cache.get(cache_key)
+	if cached_notes != None and cached_notes[0] is json_data:  # the chart hasn't been parsed again since
+		return cached_notes[1]
+
+	sanitized_notes = sanitizeChartNotes(json_data)
+	sanitized_notes_cache[cache_key] = (json_data, sanitized_notes)
+	return sanitized_notes
 
 def percentTodB(percent):
 	""" 
@@ -915,3 +1914,71 @@ def removeIllegalCharacters(string_to_modify):
 		result = "0"  # to have something at least...
 
 	return result
+
+def sanitizeChartNotes(json_data):
+	"""
+		Method:
+			Clean all the notes of a parsed FnF chart once, with the rules of Fnf_chart.getNotesFromPlayer():
+			the non-numbers arguments are removed, only the 3 first ones are kept, the column is converted to int,
+			and the notes with less than 3 arguments or a negative column are ignored. The offset and the length are converted to int (negative length = 0).
+			An error is kept in place of the note (or of the value) which causes it, so getNotesFromPlayer() raises it only when it reaches this note.
+		Argument:
+			json_data (dict) : the parsed chart, from loadChartData().
+		Return:
+			(list) : 1 tuple per section: (section (dict), notes, has_errors (bool)).
+			notes is a list of tuples (offset (int), column (int), length (int)). If has_errors is True, any of these tuples or values can be an Exception instead.
+	"""
+	sanitized_sections = []
+	for section in json_data["song"]["notes"]:  # for each section...
+		section_notes = []
+		has_errors = False
+		try:
+			raw_notes = section["sectionNotes"]
+			notes_count = len(raw_notes)
+		except Exception as error:  # raised after is_player_section, like before
+			sanitized_sections.append((section, [error], True))
+			continue
+
+		for i in range(notes_count):  # for each note in the section
+			try:
+				# Clean the note to remove extra arguments that cause crashes. Remove non-numbers arguments
+				note = [argument for argument in raw_notes[i] if is_a_float(argument)]
+				note = note[0:3]  # only keep the 3 first elemnts of the list
+				note[1] = int(note[1])  # force int conversion for the key number
+			except Exception as error:
+				section_notes.append(error)
+				has_errors = True
+				break  # the next notes would never be reached
+
+			# If we have less than 3 arguments or the argument [1] (key number isn't valid) the note is ignored
+			if len(note) < 3 or (not is_a_int(note[1])) or note[1] < 0:
+				continue
+
+			# the offset and the length are converted now, but their errors only matter if the note is used
+			try:
+				offset = int(note[0])
+			except Exception as error:
+				offset = error
+				has_errors = True
+			try:
+				length = int(note[2]) if (int(note[2]) >= 0) else 0  # round and set 0 if the length is negative
+			except Exception as error:
+				length = error
+				has_errors = True
+			section_notes.append((offset, note[1], length))
+
+		sanitized_sections.append((section, section_notes, has_errors))
+	return sanitized_sections
+
+def writeOsuSection(osu_file, section_name, section_data):
+	"""
+		Method:
+			Write a section of a .osu file made of 'key:value' lines, like [General] or [Metadata].
+		Arguments:
+			osu_file (text file object) : where to write.
+			section_name (str) : name of the section, without [].
+			section_data (dict) : the content of the section.
+		Return:
+			Nothing.
+	"""
+	osu_file.write(f"\n[{section_name}]\n" + "".join(f"{k}:{section_data[k]}\n" for k in section_data.keys()))
@@ -0,0 +1,408 @@
+""" Regression check of the converter: the generated .osu files must stay the same, byte for byte.
+
+1. Golden outputs: each chart of tests/ is converted with every map mode (with the default settings and with custom ones),
+   and the SHA-256 of each .osu file is compared with the snapshots of tests/golden/outputs.json.
+2. Differential tests: removeOverlaps() and getNotesFromPlayer() are compared with the reference implementations below
+   (the original code of the converter) on random charts, including broken notes.
+3. Timing index: the lookups of Timing_index (BPM, scroll speed, beat and time) are compared with a scan of all the timing points,
+   on the timing points of the charts of tests/ and on random ones.
+
+Usage:
+	python golden_check.py             # check everything, exit code 1 if something changed
+	python golden_check.py --update    # the outputs changed on purpose: write the new snapshots
+	python golden_check.py --fuzz 2000 --seed 42
+"""
+
+import argparse
+import copy
+from fnf_converter import Fnf_chart, Osu_map, is_a_float, is_a_int, map_modes
+import hashlib
+import json
+import os
+import random
+import sys
+import tempfile
+from timing_index import Timing_index
+
+settings_variants = {  # arguments of Osu_map which change the .osu files
+	"default": {},
+	"custom": {"background_path": "background.jpg", "custom_bpm": 150, "meter": 3, "offset": 37}
+}
+tests_folder = os.path.join(os.path.dirname(os.path.abspath(__file__)), "tests")
+snapshots_path = os.path.join(tests_folder, "golden", "outputs.json")
+
+def checkGoldenOutputs(update=False, output_path=None):
+	"""
+		Method:
+			Convert the charts of tests/ and compare the .osu files with the snapshots.
+		Arguments:
+			update (bool): if True, the snapshots are replaced by the new outputs instead.
+			output_path (str): if defined, the generated .osu files are also written in this folder (to look at the differences).
+		Return:
+			(list of str): the outputs which are different from the snapshots (or missing).
+	"""
+	outputs = {}  # {"chart/mode/settings": hash}
+	for file_name in sorted(os.listdir(tests_folder)):
+		if not(file_name.endswith(".json")) or file_name == "config.json":
+			continue
+		chart_name = os.path.splitext(file_name)[0]
+		for settings_name in settings_variants.keys():
+			for map_mode in map_modes:
+				osu_map = Osu_map("Golden", "Golden", "Golden", "golden test", "audio.ogg", **settings_variants[settings_name])
+				diff_name = f"{chart_name} {map_mode} {settings_name}"
+				osu_map.addDifficulty(diff_name, map_mode, os.path.join(tests_folder, file_name))
+				content = osu_map.fnf_charts[diff_name].getOsuFileContent(diff_name, osu_map.creator, osu_map.tags).encode("utf-8")
+				outputs[f"{chart_name}/{map_mode}/{settings_name}"] = hashlib.sha256(content).hexdigest()
+				if output_path != None:
+					with open(os.path.join(output_path, osu_map.fnf_charts[diff_name].getOsuFileName(diff_name, osu_map.creator)), "wb") as osu_file:
+						osu_file.write(content)
+
+	if update:
+		os.makedirs(os.path.dirname(snapshots_path), exist_ok=True)
+		with open(snapshots_path, "w", encoding="utf-8", newline="\n") as file:
+			json.dump(outputs, file, indent=4, sort_keys=True)
+			file.write("\n")
+		print(f"{len(outputs)} snapshots written in '{snapshots_path}'.")
+		return []
+
+	with open(snapshots_path, "r", encoding="utf-8") as file:
+		snapshots = json.loads(file.read())
+	differences = [name for name in outputs.keys() if snapshots.get(name) != outputs[name]]
+	differences += [name for name in snapshots.keys() if not(name in outputs)]
+	for name in differences:
+		print(f"DIFFERENT: {name}")
+	print(f"Golden outputs: {len(outputs)} checked, {len(differences)} different.")
+	return differences
+
+def checkTimingIndex(generator, trials):
+	"""
+		Method:
+			Compare getBpmAt(), getScrollSpeedAt(), getBeatAt() and getTimeAt() of Timing_index with referenceTimingAt() and referenceTimeAt():
+			on the timing points of the charts of tests/ (with each settings variant), then on random timing points (with some BPM at 0).
+			The times checked are the offset of each timing point, around it, before the first one, after the last one and random ones.
+		Arguments:
+			generator (random.Random): the random generator.
+			trials (int): amount of random timing points lists.
+		Return:
+			(int): the amount of differences.
+	"""
+	timing_points_lists = []  # [(name, timing points, song BPM)]
+	for file_name in sorted(os.listdir(tests_folder)):
+		if not(file_name.endswith(".json")) or file_name == "config.json":
+			continue
+		for settings_name in settings_variants.keys():
+			osu_map = Osu_map("Timing", "Timing", "Timing", "", "audio.ogg", **settings_variants[settings_name])
+			osu_map.addDifficulty("Timing", 41, os.path.join(tests_folder, file_name))
+			fnf_chart = osu_map.fnf_charts["Timing"]
+			timing_points_lists.append((f"{file_name} {settings_name}", fnf_chart.optimizeBPMList(fnf_chart.getBPMList()), fnf_chart.getBPM()))
+	for trial in range(trials):
+		timing_points = []
+		offset = generator.uniform(-500, 500)
+		for i in range(generator.randint(1, 12)):
+			timing_points.append([offset, generator.choice([0, generator.randint(60, 300), generator.uniform(1, 500)])])
+			offset += generator.choice([0, generator.uniform(1, 5000)])
+		timing_points_lists.append((f"random {timing_points}", timing_points, generator.randint(60, 300)))
+
+	differences = 0
+	for name, timing_points, song_bpm in timing_points_lists:
+		timing_index = Timing_index(timing_points, song_bpm)
+		first_offset, last_offset = timing_points[0][0], timing_points[-1][0]
+		times = [first_offset - 1000, last_offset + 10000] + [generator.uniform(first_offset - 1000, last_offset + 10000) for i in range(20)]
+		for timing_point in timing_points:
+			times += [timing_point[0] - 0.5, timing_point[0], timing_point[0] + 0.5]
+
+		for time in times:
+			bpm, scroll_speed, beat = referenceTimingAt(timing_points, song_bpm, time)
+			checks = {  # name: (expected, result)
+				"getBpmAt": (bpm, timing_index.getBpmAt(time)),
+				"getScrollSpeedAt": (scroll_speed, timing_index.getScrollSpeedAt(time)),
+				"getBeatAt": (beat, timing_index.getBeatAt(time)),
+				"getTimeAt": (referenceTimeAt(timing_points, beat), timing_index.getTimeAt(beat))
+			}
+			for function_name in checks.keys():
+				expected, result = checks[function_name]
+				if result != expected:
+					differences += 1
+					print(f"DIFFERENT: Timing_index.{function_name} at {time} ms on {name}\n\texpected: {expected}\n\tresult: {result}")
+	return differences
+
+def createRandomChart(generator):
+	"""
+		Method:
+			Generate a random FnF chart with few notes at close offsets (to have overlaps), and sometimes broken notes or sections.
+		Arguments:
+			generator (random.Random): the random generator.
+		Return:
+			(dict): the chart.
+	"""
+	bad_values = [-1, -3, 12.5, "3", "1.5", "abc", None, True, False, "nan", "inf", [1], "", 1e3]
+	sections = []
+	for i in range(generator.randint(0, 6)):
+		section_notes = []
+		for j in range(generator.randint(0, 8)):
+			note = [generator.uniform(0, 300), generator.randint(0, 9), generator.choice([0, 0, 50.4, 120, -5])]
+			if generator.random() < 0.03:  # broken note
+				for k in range(generator.randint(1, 3)):
+					note.insert(generator.randint(0, len(note)), generator.choice(bad_values))
+			if generator.random() < 0.005:
+				note = note[0:generator.randint(0, 2)]
+			section_notes.append(note)
+		section = {"sectionNotes": section_notes, "mustHitSection": generator.choice([True, False, True, False, None])}
+		if generator.random() < 0.02:
+			del section["mustHitSection"]
+		sections.append(section)
+	return {"song": {"bpm": 150, "speed": 2, "notes": sections}}
+
+def fuzzGetNotesFromPlayer(generator, trials, temp_folder):
+	"""
+		Method:
+			Compare Fnf_chart.getNotesFromPlayer() with referenceGetNotesFromPlayer() on random charts.
+			The errors must also be the same (type and message).
+		Arguments:
+			generator (random.Random): the random generator.
+			trials (int): amount of random charts.
+			temp_folder (str): where to write the charts.
+		Return:
+			(int): the amount of differences.
+	"""
+	osu_map = Osu_map("Fuzz", "Fuzz", "Fuzz", "", "")
+	differences = 0
+	for trial in range(trials):
+		chart = createRandomChart(generator)
+		chart_path = os.path.join(temp_folder, f"chart-{trial}.json")  # 1 file per chart, so the caches never give an old chart
+		with open(chart_path, "w", encoding="utf-8") as file:
+			file.write(json.dumps(chart))
+		fnf_chart = Fnf_chart(chart_path, "", "", osu_map, 41)
+
+		for player_id in [0, 1, 2]:
+			for keys_count in [4, 7]:
+				expected = getOutcome(referenceGetNotesFromPlayer, copy.deepcopy(chart), player_id, keys_count)
+				result = getOutcome(fnf_chart.getNotesFromPlayer, player_id, keys_count)
+				if result != expected:
+					differences += 1
+					print(f"DIFFERENT: getNotesFromPlayer({player_id}, {keys_count}) on {json.dumps(chart)}\n\texpected: {expected}\n\tresult: {result}")
+	return differences
+
+def fuzzRemoveOverlaps(generator, trials):
+	"""
+		Method:
+			Compare Fnf_chart.removeOverlaps() with referenceRemoveOverlaps() on random lists of notes.
+		Arguments:
+			generator (random.Random): the random generator.
+			trials (int): amount of random lists.
+		Return:
+			(int): the amount of differences.
+	"""
+	osu_map = Osu_map("Fuzz", "Fuzz", "Fuzz", "", "")
+	fnf_chart = Fnf_chart("", "", "", osu_map, 41)  # removeOverlaps() doesn't read the chart
+	differences = 0
+	for trial in range(trials):
+		keys_count = generator.randint(1, 9)
+		notes_list = []
+		for i in range(generator.randint(0, 40)):
+			notes_list.append([generator.randint(0, 200), generator.randint(0, keys_count + 1), generator.choice([0, 0, 0, 1, 2, generator.randint(0, 60)])])
+		notes_list.sort(key=lambda note: note[0])  # like getNotesFromPlayer()
+
+		expected = getOutcome(referenceRemoveOverlaps, copy.deepcopy(notes_list), keys_count)
+		result = getOutcome(fnf_chart.removeOverlaps, copy.deepcopy(notes_list), keys_count)
+		if result != expected:
+			differences += 1
+			print(f"DIFFERENT: removeOverlaps({notes_list}, {keys_count})\n\texpected: {expected}\n\tresult: {result}")
+	return differences
+
+def getOutcome(function, *arguments):
+	"""
+		Method:
+			Call a function and returns what happened, to compare 2 functions including their errors.
+		Arguments:
+			function (function): the function to call.
+			arguments: its arguments.
+		Return:
+			(tuple): ("result", returned value) or ("error", error type name, error message).
+	"""
+	try:
+		return ("result", function(*arguments))
+	except Exception as error:
+		return ("error", type(error).__name__, str(error))
+
+def main(argv=None):
+	"""
+		Method:
+			Where the check starts.
+		Arguments:
+			argv (list of str): the arguments (sys.argv[1:] by default).
+		Return:
+			(int): the exit code, 1 if something is different.
+	"""
+	parser = argparse.ArgumentParser(description="Check that the converter still generates the same .osu files.")
+	parser.add_argument("-u", "--update", action="store_true", help="write the new snapshots instead of checking them")
+	parser.add_argument("-o", "--output", default=None, help="folder where to write the generated .osu files")
+	parser.add_argument("-f", "--fuzz", type=int, default=500, help="amount of random tests of each function (default: 500)")
+	parser.add_argument("-s", "--seed", type=int, default=None, help="seed of the random tests (default: random)")
+	arguments = parser.parse_args(argv)
+
+	if arguments.output != None:
+		os.makedirs(arguments.output, exist_ok=True)
+	differences = len(checkGoldenOutputs(arguments.update, arguments.output))
+
+	seed = arguments.seed if arguments.seed != None else random.randrange(2**32)
+	generator = random.Random(seed)
+	with tempfile.TemporaryDirectory() as temp_folder:
+		fuzz_differences = fuzzRemoveOverlaps(generator, arguments.fuzz) + fuzzGetNotesFromPlayer(generator, arguments.fuzz, temp_folder) + checkTimingIndex(generator, arguments.fuzz)
+	print(f"Differential tests (seed {seed}): {arguments.fuzz} random tests of each function, {fuzz_differences} different.")
+
+	return 0 if differences + fuzz_differences == 0 else 1
+
+def referenceGetNotesFromPlayer(json_data, player_id, keys_count):
+	"""
+		Method:
+			The original Fnf_chart.getNotesFromPlayer(), on an already parsed chart. Don't optimize it: it's the reference.
+		Arguments:
+			json_data (dict): the parsed chart. It's modified (the notes are cleaned in place).
+			player_id, keys_count: see Fnf_chart.getNotesFromPlayer().
+		Return:
+			Same than Fnf_chart.getNotesFromPlayer().
+	"""
+	notes_list = []
+	for section in json_data["song"]["notes"]:
+		is_player_section = (player_id != 0) and (player_id == 1 and section["mustHitSection"] == True) or (player_id == 2 and section["mustHitSection"] == False)
+
+		for i in range(len(section["sectionNotes"])):
+			note = section["sectionNotes"][i]
+			j = 0
+			while j < len(note):
+				if not is_a_float(note[j]):
+					del note[j]
+				else:
+					j += 1
+
+			note = note[0:3]
+			note[1] = int(note[1])
+
+			if len(note) < 3 or (not is_a_int(note[1])) or note[1] < 0:
+				continue
+
+			if is_player_section and note[1] < keys_count:
+				note[0] = int(note[0])
+				note[2] = int(note[2]) if (int(note[2]) >= 0) else 0
+				notes_list.append(note)
+			elif not is_player_section and ((player_id == 0) or (note[1] >= keys_count)):
+				note[0] = int(note[0])
+				note[1] %= keys_count
+				note[2] = int(note[2]) if (int(note[2]) >= 0) else 0
+				notes_list.append(note)
+
+	notes_list.sort(key=lambda x: x[0])
+	return notes_list
+
+def referenceRemoveOverlaps(notes_list, keys_count):
+	"""
+		Method:
+			The original Fnf_chart.removeOverlaps() (with the empty columns skipped). Don't optimize it: it's the reference.
+		Arguments:
+			notes_list, keys_count: see Fnf_chart.removeOverlaps().
+		Return:
+			Same than Fnf_chart.removeOverlaps().
+	"""
+	final_notes = []
+
+	notes_list_c = []
+	for i in range(keys_count):
+		notes_list_c.append([])
+	for note in notes_list:
+		if (len(note) >= 3) and (note[1] < keys_count):
+			notes_list_c[note[1]].append(note)
+
+	for notes_column in notes_list_c:
+		if len(notes_column) <= 0:
+			continue
+
+		points = []  # [time, type] with type 1 = clickable and 0 = end of a long note
+		for note in notes_column:
+			if note[2] == 0:
+				points.append([note[0], 1])
+			else:
+				points.append([note[0], 1])
+				points.append([note[0] + note[2], 0])
+		points.sort(key=lambda x: x[0])
+
+		i = 0
+		while i < len(points):
+			if (i + 1) >= len(points):
+				i += 1
+			else:
+				if abs(points[i][0] - points[i+1][0]) < 2:
+					if (points[i][1] == 0) and (points[i+1][1] == 1):
+						del(points[i])
+					else:
+						del(points[i+1])
+				else:
+					i += 1
+
+		column_number = notes_column[0][1]
+		i = 0
+		while i < len(points):
+			if (i + 1) < len(points):
+				if points[i+1][1] == 1:
+					final_notes.append([points[i][0], column_number, 0])
+					i += 1
+				else:
+					final_notes.append([points[i][0], column_number, points[i+1][0] - points[i][0]])
+					i += 2
+			else:
+				final_notes.append([points[i][0], column_number, 0])
+				i += 1
+
+	final_notes.sort(key=lambda x: x[0])
+	return final_notes
+
+def referenceTimeAt(timing_points, beat):
+	"""
+		Method:
+			Find the time of a beat by going through all the timing points. Don't optimize it: it's the reference of Timing_index.getTimeAt().
+		Arguments:
+			timing_points (list): [offset (ms), BPM] sorted by offset, like Timing_index.
+			beat (int or float): the beat (the 1st timing point is the beat 0).
+		Return:
+			(float): the time in ms.
+	"""
+	current_index = 0  # the last timing point starting at this beat or before
+	current_beat = 0  # the beat where it starts
+	point_beat = 0
+	for i in range(len(timing_points)):
+		if i > 0 and timing_points[i-1][1] > 0:
+			point_beat += (timing_points[i][0] - timing_points[i-1][0]) / (60000/timing_points[i-1][1])
+		if point_beat <= beat:
+			current_index = i
+			current_beat = point_beat
+
+	offset, bpm = timing_points[current_index]
+	return offset + (beat - current_beat) * (60000/bpm if bpm > 0 else 0)
+
+def referenceTimingAt(timing_points, song_bpm, time):
+	"""
+		Method:
+			Find the BPM, the scroll speed and the beat at a time by going through all the timing points. Don't optimize it: it's the reference of Timing_index.
+		Arguments:
+			timing_points (list): [offset (ms), BPM] sorted by offset, like Timing_index.
+			song_bpm (int or float): the BPM of the song.
+			time (int or float): the time in ms.
+		Return:
+			(tuple): (BPM, scroll speed multiplier, beat (float)).
+	"""
+	current_index = 0  # the last timing point starting at this time or before (the 1st one if there isn't any)
+	beat = 0
+	for i in range(1, len(timing_points)):
+		if timing_points[i][0] > time:
+			break
+		if timing_points[i-1][1] > 0:
+			beat += (timing_points[i][0] - timing_points[i-1][0]) / (60000/timing_points[i-1][1])
+		current_index = i
+
+	offset, bpm = timing_points[current_index]
+	if bpm > 0:
+		beat += (time - offset) / (60000/bpm)
+	return (bpm, bpm/song_bpm, beat)
+
+if __name__ == "__main__":
+	sys.exit(main())
@@ -1,34 +1,41 @@
-from crash_window import Crash_window
-from fnf_converter import Fnf_chart, Osu_map, Osz_converter, jsonRemoveExtraData, removeIllegalCharacters
+from export_profiler import isProfilingEnabled
+from ffmpeg_detector import detectFfmpeg
 from functools import partial
 import json
+import multiprocessing
 import os
 import pathlib
-from pydub import AudioSegment
 import sys
-import tkinter as tk
-import tkinter.filedialog
-import tkinter.font as tkFont
-import tkinter.messagebox
 import threading
-from thread_with_trace import Thread_with_trace
 import traceback
-import webbrowser
+
+# the heavy modules (tkinter, fnf_converter, webbrowser) are imported only when they're needed, so the program starts faster
+tk = None  # tkinter, imported by importTkinter()
+tkFont = None  # tkinter.font, imported by importTkinter()
+tkinter = None  # imported by importTkinter()
 
 # init
 try:
-    # ffmpeg detector init
-    ffmpeg_detect_file_test = "nothing2.ogg"  # used in detectFFMPEG(). Must be a ogg audio
-    
     with open("config.json", "r") as file:  # all settings from config.json
         config_data = json.loads(file.read())  # parse it as dict
 
         app_name = config_data["app_name"]
         app_version = config_data["app_version"]  # version of the application
+        audio_backend = config_data["audio_backend"]  # how the audio.mp3 is created ("ffmpeg" = mixed and encoded in 1 pass by ffmpeg, "stream" = mixed in Python by small chunks, "pydub" = decoded and mixed in Python)
+        audio_cache_enabled = bool(int(config_data["audio_cache"]))  # reuse the audio.mp3 of the previous exports (0 or 1)
+        audio_cache_folder = config_data["audio_cache_folder"]  # where the audio.mp3 of the previous exports are kept
+        audio_cache_max_size = config_data["audio_cache_max_size"]  # maximum size of the audio cache, in MB
         check_ffmpeg = config_data["check_ffmpeg"]  # check if ffmpeg is installed when the program is started
         colors = config_data["colors"]  # dict with some colors used in the app
         delete_files_when_cancel = config_data["delete_files_when_cancel"]  # if the cancel button is pressed, delete generated files? (0 or 1)
         difficulties = config_data["init"]["difficulties"]   # the dict of lists of 2 elements {"diff_name": [map_mode (str), fnf_json_path]}
+        direct_archive = bool(int(config_data["direct_archive"]))  # write the files directly into the .osz, without creating a folder (0 or 1)
+        export_timings = config_data["export_timings"]  # write the time and memory used by each step next to the .osz ("" = no, "json" or "chrome")
+        export_trace_memory = bool(int(config_data["export_trace_memory"]))  # measure the memory allocated by each step with tracemalloc, slower (0 or 1)
+        export_workers = int(config_data["export_workers"])  # amount of processes used to create the .osu files (1 = in the export thread, 0 = 1 per CPU core)
+        ffmpeg_state_file = config_data["ffmpeg_state_file"]  # where the result of the ffmpeg detection is saved, so ffmpeg isn't run at each start
+        incremental_export = bool(int(config_data["incremental_export"]))  # keep the files of each export in output/.build, and only generate again the ones whose inputs changed (0 or 1)
+        profile_export = isProfilingEnabled(bool(int(config_data["profile_export"])) or "--profile" in sys.argv[1:])  # write a profile next to each .osz (0 or 1, also with the --profile argument or the FNF2OSU_PROFILE environment variable)
         url_ffmpeg_tutorial = config_data["url_ffmpeg_tutorial"]
         url_github = config_data["url_github"]  # link to the application's GitHub
         url_help = config_data["url_help"]  # link to get the documentation
@@ -59,6 +66,7 @@ try:
     no_selected_map_mode = "(Choose an option)"  # text to display when no map mode is selected
     no_selected_file_text = ""  # text to display when there isn't a file selected
 except:
+    from crash_window import Crash_window
     error_window = Crash_window(traceback.format_exc())
     error_window.openWindow()
 
@@ -107,7 +115,7 @@ class Exporting_window:
             if self.master.osz_converter_process != None:
                 self.changeStatus("Stopping export process...")
                 try:
-                    self.master.osz_converter_process.kill()  # kill the thread
+                    self.master.osz_converter.cancel()  # the export stops at its next step
                     self.master.osz_converter_process.join()  # definitly end it by joining the thread to the main one.
                 except: 
                     print("WARNING: error when trying to end the export thread.")
@@ -268,7 +276,7 @@ class Main_window:
         self.new_difficulty_window = New_difficulty_window(self)  # window to create a new difficulty
 
         # export
-        self.osz_converter = Osz_converter(self.exporting_window)
+        self.osz_converter = None  # Osz_converter object, created by getOszConverter() at the 1st export
         self.osz_converter_process = None  # will be Osz_converter object which does the conversion
 
         # open the window
@@ -388,6 +396,7 @@ class Main_window:
                 custom_bpm = 0  # no custom bpm
 
             # create the Osu_map object
+            from fnf_converter import Osu_map
             mapset = Osu_map(
                 self.metadata_title_entry_var.get(),  # title
                 self.metadata_artist_entry_var.get(),  # artist
@@ -406,9 +415,8 @@ class Main_window:
             for k in difficulties.keys():  # add the difficulties
                 mapset.addDifficulty(k, map_mode_values[difficulties[k][0]], difficulties[k][1])
 
-            self.osz_converter_process = Thread_with_trace(target=self.osz_converter.exportAsOsz, args=(mapset, "output"))
-            # Instead of directly using a threading.Thread, we use a Thread_with_trace (a threading.Thread class found on the Internet).
-            # By using traces, it adds the method .kill() to stop the thread.
+            self.osz_converter_process = threading.Thread(target=self.getOszConverter().exportAsOsz, args=(mapset, "output"))
+            # The export is stopped by Osz_converter.cancel() (see Exporting_window.buttonCommand())
             self.osz_converter_process.start()  # run it (in another thread)
             self.exporting_window.openWindow()
 
@@ -445,7 +453,8 @@ class Main_window:
                 return 0
 
         # read the file get the BPM
-        json_data = json.loads(jsonRemoveExtraData(json_path))  # parse the file as dict
+        from fnf_converter import jsonLoadExtraData
+        json_data = jsonLoadExtraData(json_path)  # parse the file as dict
         try:  # search in "bpm" section first
             return float(json_data["bpm"])
         except: 
@@ -455,6 +464,22 @@ class Main_window:
                 tkinter.messagebox.showerror("Impossible to get the BPM.", f"Failed to get the BPM from the '{difficulty_checked}' difficulty.\nBe sure the file is really a FNF chart, or you can select another difficulty and try again.")
                 return 0
 
+    def getOszConverter(self):
+        """
+            Class method:
+                Returns the Osz_converter which does the exports. It's created the 1st time, so fnf_converter isn't imported when the program starts.
+            Arguments:
+                None.
+            Return:
+                (Osz_converter): the converter.
+        """
+        if self.osz_converter == None:
+            from audio_cache import Audio_cache
+            from fnf_converter import Osz_converter
+            audio_cache = Audio_cache(audio_cache_folder, int(audio_cache_max_size*1024*1024), audio_cache_enabled)
+            self.osz_converter = Osz_converter(self.exporting_window, export_workers, audio_cache, direct_archive, trace_memory=export_trace_memory, timings_format=export_timings, profile=profile_export, audio_backend=audio_backend, incremental=incremental_export, app_version=app_version)
+        return self.osz_converter
+
     def openWindow(self):
         """
             Class method:
@@ -505,10 +530,10 @@ class Main_window:
             version_label.config(font=self.font_sans_12)
 
             # useful links
-            github_button = tk.Button(frame_top_part, bd=0, command=partial(webbrowser.open, url_github),  fg=colors["link"], overrelief="flat", padx=4, relief="flat", text="GitHub")
+            github_button = tk.Button(frame_top_part, bd=0, command=partial(openUrl, url_github),  fg=colors["link"], overrelief="flat", padx=4, relief="flat", text="GitHub")
             github_button.pack(side="right")
             github_button.config(font=self.font_sans_10_u)
-            help_button = tk.Button(frame_top_part, bd=0, command=partial(webbrowser.open, url_help), fg=colors["link"], overrelief="flat", padx=4, relief="flat", text="Help")
+            help_button = tk.Button(frame_top_part, bd=0, command=partial(openUrl, url_help), fg=colors["link"], overrelief="flat", padx=4, relief="flat", text="Help")
             help_button.pack(side="right")
             help_button.config(font=self.font_sans_10_u)
 
@@ -791,6 +816,8 @@ class Main_window:
         """
         global difficulties, map_mode_options, meter_options
 
+        from fnf_converter import removeIllegalCharacters
+
         # 1. Song data
         if self.metadata_title_entry_var.get() == "":  # if empty song title
             tkinter.messagebox.showerror("Invalid song title", "The song title isn't set.\nSet a song title.")
@@ -1081,7 +1108,7 @@ class No_FFMPEG_window:
                 Open the web browser to the tutorial to install ffmpeg.
         """
         global url_ffmpeg_tutorial
-        webbrowser.open(url_ffmpeg_tutorial)
+        openUrl(url_ffmpeg_tutorial)
 
     def openWindow(self):
         """
@@ -1139,34 +1166,6 @@ class No_FFMPEG_window:
 
             self.window.mainloop()
 
-def detectFFMPEG():
-    """ 
-        Method:
-            Try to detect FFMPEG by running a command that need to use it.
-            If it finishes like the issue #5, that means there's not FFMPEG installed. 
-        Argument:
-            None.
-        Return:
-            (bool): True if FFMPEG were detected, otherwise returns false.
-    """
-    """
-    try:
-        AudioSegment.from_file(ffmpeg_detect_file_test, format="ogg")
-    except:
-        return False
-    else:
-        return True
-    """
-
-    try:
-        AudioSegment.from_file(ffmpeg_detect_file_test, format="ogg")
-    except FileNotFoundError:
-        ffmpeg_detected = False
-    else:
-        ffmpeg_detected = True
-
-    return ffmpeg_detected
-
 def fileExists(file_path):
     """
         Method:
@@ -1195,6 +1194,35 @@ def getFileExtention(file_path):
     """
     return pathlib.Path(file_path).suffix.lower()
 
+def importTkinter():
+    """
+        Method:
+            Import tkinter. It's only needed by the windows, so it's imported just before the 1st one is created.
+        Arguments:
+            None.
+        Return:
+            Nothing.
+    """
+    global tk, tkFont, tkinter
+    import tkinter
+    import tkinter.filedialog
+    import tkinter.font
+    import tkinter.messagebox
+    tk = tkinter
+    tkFont = tkinter.font
+
+def openUrl(url):
+    """
+        Method:
+            Open a page in the web browser (webbrowser is imported only then).
+        Arguments:
+            url (str): the page to open.
+        Return:
+            Nothing.
+    """
+    import webbrowser
+    webbrowser.open(url)
+
 def setFilePath(string_var):
     """
         Method:
@@ -1216,7 +1244,8 @@ def setFilePath(string_var):
 def main():
     """ Where the program really starts starts. """
     try:
-        if check_ffmpeg and not(detectFFMPEG()):  # ffmpeg not detected
+        importTkinter()
+        if check_ffmpeg and detectFfmpeg("ffmpeg", ffmpeg_state_file) == None:  # ffmpeg not detected (the result is saved in ffmpeg_state_file)
             ffmpeg_window = No_FFMPEG_window()
             ffmpeg_window.openWindow()
         
@@ -1229,10 +1258,12 @@ def main():
         pass
 
     except:
+        from crash_window import Crash_window
         error_window = Crash_window(traceback.format_exc())
         error_window.openWindow()
 
 # WHERE THE PROGRAM STARTS :
 
 if __name__ == "__main__":
+    multiprocessing.freeze_support()  # needed by the processes used during the export, when the program is built as an .exe
     main()
@@ -0,0 +1,212 @@
+""" Module which includes the measure of the time and memory used by each step of an export. """
+
+import json
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+try:
+	import resource
+except ImportError:  # Windows: the peak RSS isn't available
+	resource = None
+
+class Stage_timer:
+	"""
+		Object:
+			Measures each stage (step) of an export: wall time, CPU time, peak RSS of the process and, if trace_memory is True, the memory allocated by Python (tracemalloc).
+			A stage starts with startStage() and ends when the next stage of the same thread starts (or with endStage()),
+			so the stages of several threads (for example the audio and the charts of Osz_converter) are measured separately.
+			The CPU time is the one of the thread: the work done in other processes isn't counted.
+		Arguments:
+			(optional) trace_memory (bool): if True, tracemalloc is started during the export (slower). False by default.
+	"""
+
+	def __init__(self, trace_memory=False):
+		self.trace_memory = trace_memory
+
+		self.__stages = []  # finished stages (list of dict, see getStages())
+		self.__open_stages = {}  # stage in progress of each thread: {thread id: dict}
+		self.__start_time = time.perf_counter()  # when reset() was called
+		self.__started_tracemalloc = False  # tracemalloc has to be stopped by finish()
+		self.__lock = threading.Lock()
+
+	def closeStage(self, thread_id, with_cpu_time):
+		"""
+			Class method:
+				End the stage in progress of a thread, if any. Must be called with self.__lock.
+			Arguments:
+				thread_id (int): the thread.
+				with_cpu_time (bool): True if called from this thread (else its CPU time can't be read).
+			Return:
+				Nothing.
+		"""
+		stage = self.__open_stages.pop(thread_id, None)
+		if stage == None:
+			return
+
+		stage["wall_time"] = time.perf_counter() - self.__start_time - stage["start"]
+		stage["cpu_time"] = time.thread_time() - stage.pop("cpu_start") if with_cpu_time else None
+		peak_rss = getPeakRss()
+		stage["peak_rss_delta"] = peak_rss - stage.pop("peak_rss_start") if peak_rss != None else None
+		stage["peak_rss"] = peak_rss
+		memory_start = stage.pop("memory_start")
+		if memory_start != None and tracemalloc.is_tracing():
+			memory_current, memory_peak = tracemalloc.get_traced_memory()
+			stage["memory_delta"] = memory_current - memory_start
+			stage["memory_peak"] = memory_peak  # shared by the stages of the other threads
+		else:
+			stage["memory_delta"] = None
+			stage["memory_peak"] = None
+		self.__stages.append(stage)
+
+	def endStage(self):
+		"""
+			Class method:
+				End the stage in progress of the current thread (when the thread has nothing else to do).
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		with self.__lock:
+			self.closeStage(threading.get_ident(), True)
+
+	def finish(self):
+		"""
+			Class method:
+				End all the stages in progress (the other threads ones without CPU time), and stop tracemalloc if it was started by reset().
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		with self.__lock:
+			self.closeStage(threading.get_ident(), True)
+			for thread_id in list(self.__open_stages.keys()):
+				self.closeStage(thread_id, False)
+			if self.__started_tracemalloc:
+				tracemalloc.stop()
+				self.__started_tracemalloc = False
+
+	def getChromeTrace(self):
+		"""
+			Class method:
+				Returns the finished stages in the Chrome trace format (open it with chrome://tracing or https://ui.perfetto.dev).
+			Arguments:
+				None.
+			Return:
+				(dict): the trace.
+		"""
+		trace_events = []
+		thread_names = {}  # {thread id: name}
+		for stage in self.getStages():
+			thread_names[stage["thread_id"]] = stage["thread"]
+			trace_events.append({
+				"name": stage["name"],
+				"ph": "X",  # complete event
+				"ts": stage["start"] * 1000000,  # in µs
+				"dur": stage["wall_time"] * 1000000,
+				"pid": os.getpid(),
+				"tid": stage["thread_id"],
+				"args": {key: stage[key] for key in ["cpu_time", "peak_rss", "peak_rss_delta", "memory_delta", "memory_peak"]}
+			})
+		for thread_id in thread_names.keys():  # metadata events, to display the names of the threads
+			trace_events.append({"name": "thread_name", "ph": "M", "pid": os.getpid(), "tid": thread_id, "args": {"name": thread_names[thread_id]}})
+		return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+	def getStages(self):
+		"""
+			Class method:
+				Returns the finished stages, in the order they ended.
+			Arguments:
+				None.
+			Return:
+				(list of dict): 1 dict per stage: {"name": str, "thread": str, "thread_id": int, "start": time since reset() (s), "wall_time": s, "cpu_time": s,
+				"peak_rss": peak RSS of the process (bytes), "peak_rss_delta": bytes, "memory_delta": bytes, "memory_peak": bytes}.
+				The values which can't be measured are None.
+		"""
+		with self.__lock:
+			return [dict(stage) for stage in self.__stages]
+
+	def reset(self):
+		"""
+			Class method:
+				Forget the previous stages, and start tracemalloc if trace_memory is True. Called at the beginning of an export.
+			Arguments:
+				None.
+			Return:
+				Nothing.
+		"""
+		with self.__lock:
+			self.__stages = []
+			self.__open_stages = {}
+			self.__start_time = time.perf_counter()
+			if self.trace_memory and not(tracemalloc.is_tracing()):
+				tracemalloc.start()
+				self.__started_tracemalloc = True
+
+	def startStage(self, name):
+		"""
+			Class method:
+				End the stage in progress of the current thread, and start a new one.
+			Arguments:
+				name (str): name of the new stage.
+			Return:
+				Nothing.
+		"""
+		with self.__lock:
+			thread_id = threading.get_ident()
+			self.closeStage(thread_id, True)
+
+			if tracemalloc.is_tracing() and self.trace_memory:
+				memory_start = tracemalloc.get_traced_memory()[0]
+				if hasattr(tracemalloc, "reset_peak"):  # Python 3.9+
+					tracemalloc.reset_peak()
+			else:
+				memory_start = None
+			self.__open_stages[thread_id] = {
+				"name": name,
+				"thread": threading.current_thread().name,
+				"thread_id": thread_id,
+				"start": time.perf_counter() - self.__start_time,
+				"cpu_start": time.thread_time(),
+				"peak_rss_start": getPeakRss() or 0,
+				"memory_start": memory_start
+			}
+
+	def writeFile(self, file_path, trace_format="json"):
+		"""
+			Class method:
+				Write the finished stages in a file.
+			Arguments:
+				file_path (str): where to write.
+				(optional) trace_format (str): "json" (default) for the list of getStages(), or "chrome" for getChromeTrace().
+			Return:
+				Nothing.
+		"""
+		assert trace_format in ["json", "chrome"]
+		if trace_format == "chrome":
+			data = self.getChromeTrace()
+		else:
+			stages = self.getStages()
+			data = {"stages": stages, "total_time": max([stage["start"] + stage["wall_time"] for stage in stages], default=0)}
+		with open(file_path, "w", encoding="utf-8") as file:
+			json.dump(data, file, indent=4)
+
+def getPeakRss():
+	"""
+		Method:
+			Returns the peak RSS (the maximum of physical memory used) of the process since it started.
+		Arguments:
+			None.
+		Return:
+			(int): the peak RSS in bytes, or None if it can't be read (Windows).
+	"""
+	if resource == None:
+		return None
+	peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+	if sys.platform == "darwin":  # already in bytes
+		return peak_rss
+	return peak_rss * 1024  # in KB on Linux
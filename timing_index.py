@@ -0,0 +1,113 @@
+""" Module which includes the index of the timing points (BPM changes) of a chart, to find the BPM or the beat at any time quickly. """
+
+from bisect import bisect_right
+
+class Timing_index:
+	"""
+		Object:
+			The timing points of a chart, built once per chart (see Fnf_chart.getTimingIndex()), as parallel lists sorted by offset:
+			the offset of each timing point, its BPM, its scroll speed multiplier (BPM / song BPM, to keep the same scroll speed) and the beat where it starts.
+			The timing point in effect at a time, and the conversions between ms and beats, are found by bisection: O(log n) whatever the amount of BPM changes.
+		Arguments:
+			timing_points (list): list of lists with 2 elements [offset (ms), BPM], sorted by offset (from Fnf_chart.optimizeBPMList()).
+			song_bpm (int or float): the BPM of the song (from Fnf_chart.getBPM()).
+	"""
+	__slots__ = ("offsets", "bpms", "sv_multipliers", "beat_lengths", "beats", "song_bpm")
+
+	def __init__(self, timing_points, song_bpm):
+		self.song_bpm = song_bpm
+		self.offsets = [timing_point[0] for timing_point in timing_points]
+		self.bpms = [timing_point[1] for timing_point in timing_points]
+		self.sv_multipliers = [bpm/song_bpm for bpm in self.bpms]
+		self.beat_lengths = [60000/bpm if bpm > 0 else 0 for bpm in self.bpms]  # time between 2 beats in ms, like bpmToMs()
+
+		# the beat where each timing point starts, the 1st one starts at the beat 0
+		self.beats = []
+		beat = 0
+		for i in range(len(self.offsets)):
+			if i > 0 and self.beat_lengths[i-1] > 0:
+				beat += (self.offsets[i] - self.offsets[i-1]) / self.beat_lengths[i-1]
+			self.beats.append(beat)
+
+	def __len__(self):
+		return len(self.offsets)
+
+	def getBeatAt(self, time):
+		"""
+			Class method:
+				Returns the beat at a time (the 1st timing point is the beat 0). Before the 1st timing point, its BPM is used.
+			Arguments:
+				time (int or float): the time in ms.
+			Return:
+				float: the beat (not rounded).
+		"""
+		i = self.getIndexAt(time)
+		if self.beat_lengths[i] == 0:
+			return self.beats[i]
+		return self.beats[i] + (time - self.offsets[i]) / self.beat_lengths[i]
+
+	def getBpmAt(self, time):
+		"""
+			Class method:
+				Returns the BPM in effect at a time.
+			Arguments:
+				time (int or float): the time in ms.
+			Return:
+				int or float: the BPM.
+		"""
+		return self.bpms[self.getIndexAt(time)]
+
+	def getIndexAt(self, time):
+		"""
+			Class method:
+				Returns the index of the timing point in effect at a time: the last one starting at this time or before (the 1st one if the time is before all of them).
+			Arguments:
+				time (int or float): the time in ms.
+			Return:
+				int: the index in the lists of this Timing_index.
+		"""
+		assert len(self.offsets) > 0, "Timing_index without timing point."
+		return max(0, bisect_right(self.offsets, time) - 1)
+
+	def getOsuTimingLines(self, offset, meter, sample_set, sample_index, volume):
+		"""
+			Class method:
+				Returns the lines of the [TimingPoints] section of a .osu file, in 1 pass: for each timing point,
+				a red line (uninherited, the BPM change) then a green line (inherited, the scroll speed change to keep the same scroll speed).
+			Arguments:
+				offset (int): added to the time of each timing point, in ms.
+				meter (int): the meter of the red lines.
+				sample_set, sample_index, volume (int): the hitsounds settings of each line.
+			Return:
+				str: the lines.
+		"""
+		timing_lines = []
+		for i in range(len(self.offsets)):
+			time = int(self.offsets[i]) + offset
+			timing_lines.append(f"{time},{self.beat_lengths[i]},{meter},{sample_set},{sample_index},{volume},1,0\n")
+			timing_lines.append(f"{time},{-100*self.sv_multipliers[i]},{meter},{sample_set},{sample_index},{volume},0,0\n")
+		return "".join(timing_lines)
+
+	def getScrollSpeedAt(self, time):
+		"""
+			Class method:
+				Returns the scroll speed multiplier in effect at a time (BPM / song BPM).
+			Arguments:
+				time (int or float): the time in ms.
+			Return:
+				float: the multiplier.
+		"""
+		return self.sv_multipliers[self.getIndexAt(time)]
+
+	def getTimeAt(self, beat):
+		"""
+			Class method:
+				Returns the time of a beat, the opposite of getBeatAt().
+			Arguments:
+				beat (int or float): the beat (the 1st timing point is the beat 0).
+			Return:
+				float: the time in ms.
+		"""
+		assert len(self.beats) > 0, "Timing_index without timing point."
+		i = max(0, bisect_right(self.beats, beat) - 1)
+		return self.offsets[i] + (beat - self.beats[i]) * self.beat_lengths[i]